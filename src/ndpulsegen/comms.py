@@ -2,7 +2,6 @@ import numpy as np
 import time
 import serial
 import serial.tools.list_ports
-import struct
 import threading
 import queue
 from . import transcode
@@ -58,9 +57,8 @@ class PulseGenerator():
         valid_ports = []
         comports = list(serial.tools.list_ports.comports())
         for comport in comports:
-            if 'vid' in vars(comport) and 'pid' in vars(comport):
-                if vars(comport)['vid'] == 1027 and vars(comport)['pid'] == 24592:
-                    valid_ports.append(comport)
+            if getattr(comport, 'vid', None) == 1027 and getattr(comport, 'pid', None) == 24592:
+                valid_ports.append(comport)
         # For every valid port, ask for an echo (which also sends serial number etc.) and store the info
         validated_devices = []
         unvalidated_devices = []
@@ -96,38 +94,35 @@ class PulseGenerator():
         return {'validated_devices':validated_devices, 'unvalidated_devices':unvalidated_devices}
 
     def monitor_serial(self):
+        # Bytes read but not yet decoded. Everything waiting in the input buffer is read at once and split into
+        # messages in memory, rather than reading the identifier and then the rest of each message separately.
+        buf = bytearray()
         while not self.close_readthread_event.is_set():
-            # Try reading one byte. The first byte is always the message identifier
             try:
-                byte_message_identifier = self.ser.read(1)
+                chunk = self.ser.read(max(1, self.ser.in_waiting))
             except serial.serialutil.SerialException as ex:
                 self.close_readthread_event.set()
                 break
-            # Normally the read will timeout and return empty, but if it returns someting try to read the reminder of the message
-            if byte_message_identifier:
-                timestamp = time.time()
-                message_identifier, = struct.unpack('B', byte_message_identifier)
-                # Only read more bytes if the identifier is valid
-                if message_identifier not in transcode.msgin_decodeinfo.keys():
+            # Normally the read will timeout and return empty. Any bytes still left over then are the start of
+            # a message that will never be completed (a random byte still has a chance of being a valid identifier)
+            if not chunk:
+                if buf:
+                    self.msgin_queues['bytes_dropped'].put({'message_identifier':buf[0], 'message':None, 'timestamp':time.time()})
+                    buf.clear()
+                continue
+            timestamp = time.time()
+            buf.extend(chunk)
+            pos = 0
+            for pos, message_identifier, message_type, message in transcode.decode_messages(buf):
+                if message_type is None:
                     self.msgin_queues['bytes_dropped'].put({'message_identifier':message_identifier, 'message':None, 'timestamp':timestamp})
-                else:
-                    decodeinfo = transcode.msgin_decodeinfo[message_identifier]
-                    message_length = decodeinfo['message_length'] - 1
-                    try:
-                        byte_message = self.ser.read(message_length)
-                    except serial.serialutil.SerialException as ex:
-                        self.close_readthread_event.set()
-                        break   
-                    # A random byte still a chance of being valid, so the read could timeout without reading a whole message worth of bytes
-                    if len(byte_message) != message_length:
-                        self.msgin_queues['bytes_dropped'].put({'message_identifier':message_identifier, 'message':None, 'timestamp':timestamp})
-                    else:
-                        # At this point, just decode the message and put it in the queue corresponding to its type.
-                        decode_function = decodeinfo['decode_function']
-                        message = decode_function(byte_message)
-                        message['timestamp'] = timestamp
-                        queue_name = decodeinfo['message_type']
-                        self.msgin_queues[queue_name].put(message)
+                    continue
+                if isinstance(message, Exception):
+                    raise message
+                # At this point, just put the message in the queue corresponding to its type.
+                message['timestamp'] = timestamp
+                self.msgin_queues[message_type].put(message)
+            del buf[:pos]
 
     def disconnect(self):
         self.close_readthread_event.set()
@@ -190,8 +185,11 @@ class PulseGenerator():
         These instructions must be generated using the transcode.encode_instruction function. 
         This function accecpts encoded instructions in the following formats (where each individual instruction is always
         in bytes/bytearray): A single encoded instruction, multiple encoded instructions joined together in a single bytes/bytearray, 
-        or a list, tuple, or array of single or multiple encoded instructions.'''
-        if isinstance(instructions, (list, tuple, np.ndarray)):
+        or a list, tuple, or array of single or multiple encoded instructions. A uint8 array of raw instruction bytes, 
+        such as returned by transcode.encode_instruction_batch, is sent as one contiguous block.'''
+        if isinstance(instructions, np.ndarray) and instructions.dtype == np.uint8:
+            self.write_command(instructions.tobytes())
+        elif isinstance(instructions, (list, tuple, np.ndarray)):
             self.write_command(b''.join(instructions)) 
         else:
             self.write_command(instructions) 
@@ -1,24 +1,162 @@
-from .transcode import encode_instruction
+from bisect import bisect_left, insort
+from operator import attrgetter
+from enum import IntEnum
+from collections.abc import MutableMapping
+import numpy as np
+from .transcode import encode_instruction_batch, encode_instruction_tags
 from .comms import PulseGenerator
 
+# Bit of each instruction flag in an update's flags_word, matching the tags field of an encoded instruction
+FLAG_STOP_AND_WAIT = encode_instruction_tags(stop_and_wait=True)
+FLAG_HARDWARE_TRIG_OUT = encode_instruction_tags(hardware_trig_out=True)
+FLAG_NOTIFY_COMPUTER = encode_instruction_tags(notify_computer=True)
+FLAG_POWERLINE_SYNC = encode_instruction_tags(powerline_sync=True)
+
+def _pack_flags(stop_and_wait=None, hardware_trig_out=None, notify_computer=None, powerline_sync=None):
+    """
+    Convert flag values into (mask, word), where mask has the bit of every flag that is not None
+    and word the bits of the flags that are True. An update applies them with
+    flags_word = (flags_word & ~mask) | word, so a later False overrides an earlier True.
+    """
+    # Both are packed by encode_instruction_tags, so the bit layout is only defined there. Flag values are
+    # not explicitly validated; errors are caught in its dictionary lookup.
+    mask = encode_instruction_tags(stop_and_wait is not None, hardware_trig_out is not None,
+                                   notify_computer is not None, powerline_sync is not None)
+    word = encode_instruction_tags(False if stop_and_wait is None else stop_and_wait,
+                                   False if hardware_trig_out is None else hardware_trig_out,
+                                   False if notify_computer is None else notify_computer,
+                                   False if powerline_sync is None else powerline_sync)
+    return mask, word
+
+def _scan_states(set_masks, clr_masks, start_state):
+    """
+    Return the output state after each update, given the bits each one sets and clears and the state
+    before the first. This is the running state = (state & ~clr) | set, done as a parallel prefix scan
+    in log2(N) whole array steps rather than N Python steps. It works because applying (clr1, set1)
+    then (clr2, set2) is the same as applying the single update (clr1 | clr2, (set1 & ~clr2) | set2).
+    """
+    set_masks = set_masks.copy()
+    clr_masks = clr_masks.copy()
+    step = 1
+    while step < len(set_masks):
+        # After this, entry i combines the updates (i - 2*step, i]. The right hand sides are evaluated
+        # in full before the assignment, so they use the combinations from the previous step.
+        set_masks[step:] = (set_masks[:-step] & ~clr_masks[step:]) | set_masks[step:]
+        clr_masks[step:] = clr_masks[:-step] | clr_masks[step:]
+        step *= 2
+    return (start_state & ~clr_masks) | set_masks
+
+class FlagsMode(IntEnum):
+    """
+    Which edges of a pulse train get its flags. See Channel.pulse_high.
+    The lower case names ('start', 'every', 'end') are accepted wherever a FlagsMode is.
+    """
+    START = 0
+    EVERY = 1
+    END = 2
+
+class _Update:
+    """
+    Everything scheduled to happen at one clock cycle. set_mask and clr_mask hold the channels the
+    update turns on and off, and flags_word the instruction flags packed as in the FLAG_* constants.
+    Gotos are few, so they are kept separately in Compiler.gotos.
+    """
+    __slots__ = ('set_mask', 'clr_mask', 'flags_word')
+
+    def __init__(self):
+        self.set_mask = 0
+        self.clr_mask = 0
+        self.flags_word = 0
+
+class _StartingStateView(MutableMapping):
+    """
+    The starting state as a {channel_number: bool} mapping, read from and written through to
+    Compiler.starting_state_mask, so code written against the old starting_state dict keeps working.
+    """
+    __slots__ = ('_compiler',)
+
+    def __init__(self, compiler):
+        self._compiler = compiler
+
+    def __getitem__(self, channel_number):
+        if not 0 <= channel_number < Compiler.NUM_CHANNELS:
+            raise KeyError(channel_number)
+        return bool((self._compiler.starting_state_mask >> channel_number) & 1)
+
+    def __setitem__(self, channel_number, state):
+        self._compiler._set_starting_state_bit(channel_number, state)
+
+    def __delitem__(self, channel_number):
+        raise TypeError('Every channel has a starting state, so entries cannot be deleted')
+
+    def __iter__(self):
+        return iter(range(Compiler.NUM_CHANNELS))
+
+    def __len__(self):
+        return Compiler.NUM_CHANNELS
+
+    def copy(self):
+        return dict(self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
 class Compiler:
     CLOCK_PERIOD = 10e-9
+    NUM_CHANNELS = 24
 
     def __init__(self):
-        self.updates = {}  # Dictionary keyed by absolute time; each entry is {'states': {}, 'goto': {}, 'flags': {}}
-        self.starting_state = {i: False for i in range(24)}
+        self.updates = {}  # Dictionary keyed by absolute time; each entry is an _Update
+        self.update_times = []  # The keys of self.updates, kept in ascending order as they are added
+        self.gotos = {}  # Dictionary keyed by the time of the instruction that jumps; each entry is (t_to, goto_counter)
+        self.starting_state_mask = 0  # Bit i is the state of channel i at t=0
         self.instructions = []
-        self.channels = {}  # Cache for Channel objects
+        self.instruction_block = b''  # The compiled instructions joined into one contiguous bytes object, ready to upload
+        self.channels = [None] * Compiler.NUM_CHANNELS  # Cache for Channel objects, indexed by channel number
         self.sequence_duration = None  # Optional overall sequence duration
         self.final_address = None
+        # Per update results of the last compile, and the earliest time changed since. compile reuses the
+        # results for every update before that time instead of recomputing the whole sequence.
+        self._compile_cache = None
+        self._dirty_from = None
+        self._up_to_date = False  # True when nothing has changed since the last successful compile
+
+    @staticmethod
+    def _to_cycles(t):
+        """Convert a time in seconds to the nearest whole number of clock cycles (half cycles round to even)."""
+        # Kept as round(t / CLOCK_PERIOD) so conversions are bit identical to earlier versions, including for
+        # negative times and exact half cycles
+        return round(t / Compiler.CLOCK_PERIOD)
+
+    @property
+    def starting_state(self):
+        """The starting state of every channel as a {channel_number: bool} mapping, backed by starting_state_mask."""
+        return _StartingStateView(self)
+
+    @starting_state.setter
+    def starting_state(self, state_dict: dict):
+        # Replaces the whole starting state; channels missing from state_dict start low
+        self._mark_dirty(0)
+        self.starting_state_mask = 0
+        self.set_starting_state(state_dict)
 
     def set_starting_state(self, state_dict: dict):
         """Update the starting state for multiple channels."""
-        self.starting_state.update(state_dict)
+        for channel_number, state in state_dict.items():
+            self._set_starting_state_bit(channel_number, state)
+
+    def _set_starting_state_bit(self, channel_number: int, state):
+        self._mark_dirty(0)
+        bit = 1 << channel_number
+        if state:
+            self.starting_state_mask |= bit
+        else:
+            self.starting_state_mask &= ~bit
 
     def set_sequence_duration(self, sequence_duration, time_unit='seconds'):
+        self._up_to_date = False
         if time_unit == 'seconds':
-            self.sequence_duration = int(round(sequence_duration/Compiler.CLOCK_PERIOD))
+            self.sequence_duration = Compiler._to_cycles(sequence_duration)
         else:
             self.sequence_duration = int(sequence_duration)
 
@@ -28,6 +166,26 @@ class Compiler:
     def get_instructions(self):
         return self.instructions
 
+    def _mark_dirty(self, t: int):
+        """
+        Record that the updates from clock cycle t onwards have changed since the last compile.
+        """
+        self._up_to_date = False
+        if self._dirty_from is None or t < self._dirty_from:
+            self._dirty_from = t
+
+    def _update_at(self, t: int):
+        """
+        Return the update scheduled at clock cycle t, creating it if it doesn't exist yet.
+        The caller is expected to modify it, so it is marked dirty.
+        """
+        self._mark_dirty(t)
+        update = self.updates.get(t)
+        if update is None:
+            update = self.updates[t] = _Update()
+            insort(self.update_times, t)
+        return update
+
     def add_update(self, t: float,
                 state_dict: dict = None,
                 stop_and_wait=None,
@@ -46,25 +204,50 @@ class Compiler:
             notify_computer (optional): Value for the 'notify_computer' flag.
             powerline_sync (optional): Value for the 'powerline_sync' flag.
         """
+        # Fold the state_dict into the bits this update sets and clears. A later write to the same
+        # channel overrides an earlier one.
+        set_bits = 0
+        clr_bits = 0
+        if state_dict:
+            for channel, value in state_dict.items():
+                bit = 1 << channel
+                if value:
+                    set_bits |= bit
+                    clr_bits &= ~bit
+                else:
+                    clr_bits |= bit
+                    set_bits &= ~bit
+        self._add_masks(t, set_bits, clr_bits, stop_and_wait, hardware_trig_out, notify_computer, powerline_sync, time_unit)
+
+    def _add_masks(self, t: float, set_bits: int, clr_bits: int,
+                   stop_and_wait=None,
+                   hardware_trig_out=None,
+                   notify_computer=None,
+                   powerline_sync=None,
+                   time_unit='seconds'):
+        """
+        Same as add_update, but with the channel states given directly as the bits to set and the bits
+        to clear (bit i is channel i), which must not overlap. They override whatever the update at t
+        already does to those channels.
+        """
         # convert time to clock cycles if not already done so
         if time_unit == 'seconds':
-            t = int(round(t/Compiler.CLOCK_PERIOD))
+            t = Compiler._to_cycles(t)
         else:
             t = int(t)
 
-        # Create the update structure if it doesn't exist
-        if t not in self.updates:
-            self.updates[t] = {'states': {}, 'goto': {}, 'flags': {}}
+        # Create the update structure if it doesn't exist, with a single lookup of t
+        update = self._update_at(t)
+        update.set_mask = (update.set_mask & ~clr_bits) | set_bits
+        update.clr_mask = (update.clr_mask & ~set_bits) | clr_bits
 
-        # Update the 'states' section if a state_dict is provided
-        if state_dict:
-            self.updates[t]['states'].update(state_dict)
+        # Most updates (e.g. pulse edges) carry no flags, so skip packing them altogether
+        if stop_and_wait is None and hardware_trig_out is None and notify_computer is None and powerline_sync is None:
+            return
 
-        # Update the flags dict only for non None values
-        flags_update = {'stop_and_wait':stop_and_wait, 'hardware_trig_out':hardware_trig_out, 'notify_computer':notify_computer, 'powerline_sync':powerline_sync}
-        flags = {key: value for key, value in flags_update.items() if value is not None}
-        if flags:
-            self.updates[t]['flags'].update(flags)
+        # Pack only the non None flags into the flags word, passing them straight through rather than via a dict
+        flags_mask, flags_word = _pack_flags(stop_and_wait, hardware_trig_out, notify_computer, powerline_sync)
+        update.flags_word = (update.flags_word & ~flags_mask) | flags_word
 
     def add_goto(self, t_from: float, t_to: float, goto_counter: int, time_unit='seconds'):
         """
@@ -75,21 +258,96 @@ class Compiler:
         I now have empty states and flags, I think this is ok.
         """
         if time_unit == 'seconds':
-            t_from = int(round(t_from/Compiler.CLOCK_PERIOD))
-            t_to = int(round(t_to/Compiler.CLOCK_PERIOD))
+            t_from = Compiler._to_cycles(t_from)
+            t_to = Compiler._to_cycles(t_to)
         else:
             t_from = int(t_from)
             t_to = int(t_to)
         
-        if t_from - 1 not in self.updates:
-            self.updates[t_from - 1] = {'states': {}, 'goto': {'t_to':t_to, 'counter':goto_counter}, 'flags': {}}
-        else:
-            self.updates[t_from - 1]['goto'].update({'t_to':t_to, 'counter':goto_counter})
+        self._update_at(t_from - 1)
+        self.gotos[t_from - 1] = (t_to, goto_counter)
 
         # I have to ensure there is some update at the t_to time, so that the compiler can ensure there 
         # will be an instruction there to jump to. But I don't need to add anything to it.
-        if t_to not in self.updates:
-            self.updates[t_to] = {'states': {}, 'goto': {}, 'flags': {}}
+        self._update_at(t_to)
+
+    def add_pulse_train(self, channel_number: int, t: int, duration_first_segment: int, duration_second_segment: int = 0, N: int = 1,
+                        first_segment_high: bool = True, flags: dict = None, flags_mode: str = 'start'):
+        """
+        Schedule N pulses on one channel in a single call. All times are in clock cycles.
+        Each pulse holds the channel at the first segment level for duration_first_segment, then at the
+        opposite level for duration_second_segment. The non-None entries of flags are attached to the
+        edges selected by flags_mode (see Channel.pulse_high).
+
+        This is the bulk equivalent of calling add_update twice per pulse, and is what Channel.pulse_high
+        and Channel.pulse_low use.
+        """
+        # Resolve the mode once, rather than comparing strings for every pulse
+        try:
+            flags_mode = FlagsMode[flags_mode.upper()] if isinstance(flags_mode, str) else FlagsMode(flags_mode)
+        except (KeyError, ValueError):
+            raise ValueError("Invalid value for flags_mode. Valid entries are \"start\", \"evey\", \"end\"") from None
+        flags = {key: value for key, value in flags.items() if value is not None} if flags else {}
+        flags_mask, flags_word = _pack_flags(**flags) if flags else (0, 0)
+
+        # Every edge time of the train in one go
+        pulse_starts = t + np.arange(N, dtype=np.int64) * (duration_first_segment + duration_second_segment)
+        pulse_ends = pulse_starts + duration_first_segment
+
+        bit = 1 << channel_number
+        if first_segment_high:
+            first_set, first_clr = bit, 0
+        else:
+            first_set, first_clr = 0, bit
+        second_set, second_clr = first_clr, first_set
+
+        updates = self.updates
+        # With non-negative durations the edge times ascend from t. Negative durations are allowed, but then the
+        # edges can come in any order.
+        edges_ascend = duration_first_segment >= 0 and duration_second_segment >= 0
+        if edges_ascend or N < 1:
+            self._mark_dirty(t)
+        else:
+            self._mark_dirty(min(int(pulse_starts.min()), int(pulse_ends.min())))
+        # Collect the new edge times and add them to update_times in one go at the end, rather than shifting
+        # the list along for every insort.
+        new_times = []
+        new_times_append = new_times.append
+        # The flags go on the start edge of pulses [0, num_flagged_starts), and on the end edge of pulse flagged_end
+        num_flagged_starts = {FlagsMode.START: 1, FlagsMode.EVERY: N, FlagsMode.END: 0}[flags_mode] if flags else 0
+        flagged_end = N - 1 if flags and flags_mode == FlagsMode.END else -1
+        for pulse, (pulse_start, pulse_end) in enumerate(zip(pulse_starts.tolist(), pulse_ends.tolist())):
+            update = updates.get(pulse_start)
+            if update is None:
+                update = updates[pulse_start] = _Update()
+                new_times_append(pulse_start)
+            update.set_mask = (update.set_mask & ~first_clr) | first_set
+            update.clr_mask = (update.clr_mask & ~first_set) | first_clr
+            if pulse < num_flagged_starts:
+                update.flags_word = (update.flags_word & ~flags_mask) | flags_word
+
+            update = updates.get(pulse_end)
+            if update is None:
+                update = updates[pulse_end] = _Update()
+                new_times_append(pulse_end)
+            update.set_mask = (update.set_mask & ~second_clr) | second_set
+            update.clr_mask = (update.clr_mask & ~second_set) | second_clr
+            if pulse == flagged_end:
+                update.flags_word = (update.flags_word & ~flags_mask) | flags_word
+
+        update_times = self.update_times
+        if not edges_ascend:
+            new_times.sort()
+        if new_times:
+            if not update_times or new_times[0] > update_times[-1]:
+                # The usual case of a train scheduled after everything else
+                update_times.extend(new_times)
+            elif len(new_times) == 1:
+                insort(update_times, new_times[0])
+            else:
+                # Both runs are already sorted, which sort detects and merges in a single pass
+                update_times.extend(new_times)
+                update_times.sort()
 
     def channel(self, channel_number: int, starting_state = None):
         """
@@ -97,59 +355,100 @@ class Compiler:
         starting_state: None, True, False. Allows you to specify what the channel will be set to on the
         first instruction executed (at t=0).
         """
-        if channel_number not in self.channels:
-            self.channels[channel_number] = Channel(channel_number, self)
+        if not 0 <= channel_number < Compiler.NUM_CHANNELS:
+            raise ValueError(f'channel_number out of range. Must be in range [0, {Compiler.NUM_CHANNELS - 1}]')
+        channel = self.channels[channel_number]
+        if channel is None:
+            channel = self.channels[channel_number] = Channel(channel_number, self)
 
         if starting_state is not None:
-            self.starting_state[channel_number] = bool(starting_state)
-        return self.channels[channel_number]
+            self._set_starting_state_bit(channel_number, starting_state)
+        return channel
 
     def compile(self):
         """
         Process the scheduled updates to generate encoded instructions.
         This version also handels goto's
         """
+        # Compiling the same schedule again gives the same instructions, so don't redo the work
+        if self._up_to_date:
+            return self.instructions
+
         self.instructions = []
+        self.instruction_block = b''
         if not self.updates:
             return
 
-        # Sort updates by absolute time
-        sorted_updates = sorted(self.updates.items())
-        current_state = self.starting_state.copy()
-
-        # Ensure an update exists at time 0
-        if sorted_updates[0][0] != 0:
-            sorted_updates.insert(0, (0, {'states': current_state.copy(), 'goto': {}, 'flags': {}}))
+        # Keep the times and the updates in two parallel lists rather than a list of (time, update) pairs.
+        # update_times is already sorted, so the updates can be read out in time order directly.
+        # Ensure an update exists at time 0. An empty one is put at the head as the lists are built,
+        # rather than inserted afterwards and shifting everything along.
+        if self.update_times[0] == 0:
+            time_list = list(self.update_times)
+            update_list = list(map(self.updates.__getitem__, self.update_times))
+        else:
+            time_list = [0, *self.update_times]
+            update_list = [_Update(), *map(self.updates.__getitem__, self.update_times)]
+        # Bit i of the state mask is the output of channel i
+        current_state = self.starting_state_mask
 
         # Calculate duration for the final update
-        final_update_time = sorted_updates[-1][0]
+        final_update_time = time_list[-1]
         if self.sequence_duration is None:
             final_update_duration = 1
         else:
             final_update_duration = self.sequence_duration - final_update_time
             assert final_update_duration >= 1, "Sequence duration must extend beyond the last update"
-        
-        # Append a dummy update to determine the duration of the last segment
-        sorted_updates.append((final_update_time + final_update_duration, {'states': {}, 'goto': {}, 'flags': {}}))
-
-        # generate a mapping from time to address, so that I can quickly look up the address for a given t_to
-        time_to_address_lookup = {time: idx for idx, (time, _) in enumerate(sorted_updates)}
-
-        # Generate instructions for each time interval
-        for address, (current_update, next_update) in enumerate(zip(sorted_updates, sorted_updates[1:])):
-            duration = next_update[0] - current_update[0]
-            current_state.update(current_update[1]['states'])
-            # Create a boolean list representing channels 0 through 23
-            state = [current_state[i] for i in range(24)]
-            # Get the goto_time is it exists. Otherwise make it 0.
-            # print(current_update)
-            t_to = current_update[1]['goto'].get('t_to', 0)
-            # Encode the instruction. 
-            # Use the address of the instruction at time t_to instruction. And use the goto counter if it exists, otherwise 0.
-            self.instructions.append(
-                encode_instruction(address, duration, state, time_to_address_lookup[t_to], current_update[1]['goto'].get('counter', 0), **current_update[1]['flags'])
-            )
+        sequence_end_time = final_update_time + final_update_duration
+
+        # Gather every field of every instruction into flat arrays, then encode them all in one go.
+        num_instructions = len(time_list)
+        times = np.array(time_list, dtype=np.int64)
+        # Each instruction lasts until the next one starts, and the last one until the end of the sequence
+        durations = np.diff(times, append=sequence_end_time)
+
+        # Nothing before _dirty_from has changed since the last compile, so those updates (and the running state
+        # up to them) are exactly as they were. Start from the cached results for them and only process the rest.
+        num_reused = 0
+        if self._compile_cache is not None:
+            cached_times, cached_states, cached_tags = self._compile_cache
+            num_reused = len(cached_times) if self._dirty_from is None else bisect_left(cached_times, self._dirty_from)
+        if num_reused:
+            current_state = int(cached_states[num_reused - 1])
+        new_updates = update_list[num_reused:]
+        num_new = len(new_updates)
+        set_masks = np.fromiter(map(attrgetter('set_mask'), new_updates), dtype=np.int64, count=num_new)
+        clr_masks = np.fromiter(map(attrgetter('clr_mask'), new_updates), dtype=np.int64, count=num_new)
+        new_tags = np.fromiter(map(attrgetter('flags_word'), new_updates), dtype=np.int64, count=num_new)
+        states = _scan_states(set_masks, clr_masks, current_state)
+        tags = new_tags
+        if num_reused:
+            states = np.concatenate((cached_states[:num_reused], states))
+            tags = np.concatenate((cached_tags[:num_reused], tags))
+        self._compile_cache = (time_list, states, tags)
+        self._dirty_from = None
+
+        # Instructions without a goto jump to address 0 with a counter of 0, which is never taken.
+        # times is sorted and both ends of every goto have an update of their own, so the index of a time in times is its address.
+        goto_from = np.array(list(self.gotos.keys()), dtype=np.int64)
+        goto_to = np.array([t_to for t_to, _ in self.gotos.values()], dtype=np.int64)
+        counters = np.array([goto_counter for _, goto_counter in self.gotos.values()]) if self.gotos else np.zeros(0, dtype=np.int64)
+        from_addresses = np.searchsorted(times, goto_from)
+        to_addresses = np.searchsorted(times, goto_to)
+        assert np.array_equal(times[np.minimum(to_addresses, num_instructions - 1)], goto_to), "Every goto must jump to the time of an update"
+        goto_addresses = np.zeros(num_instructions, dtype=np.int64)
+        goto_addresses[from_addresses] = to_addresses
+        # Keep the dtype of the counters, so that non integer counters are still rejected by the encoder
+        goto_counters = np.zeros(num_instructions, dtype=np.result_type(counters, np.int64))
+        goto_counters[from_addresses] = counters
+        encoded = encode_instruction_batch(np.arange(num_instructions), durations, states, goto_addresses, goto_counters, tags).tobytes()
+        self.instruction_block = encoded
+
+        # Split the encoded block into one bytes object per instruction, all at once into a list of the right size
+        instruction_length = len(encoded) // num_instructions
+        self.instructions = [encoded[idx:idx + instruction_length] for idx in range(0, len(encoded), instruction_length)]
         self.final_address = len(self.instructions) - 1
+        self._up_to_date = True
         return self.instructions
 
     def upload_instructions(self, pulse_generator: PulseGenerator) -> None:
@@ -158,7 +457,8 @@ class Compiler:
         This is a convenience function. You can also just pass the compiled instructions 
         to your own pulse_generator instance manually.
         """
-        pulse_generator.write_instructions(self.instructions)
+        # The contiguous block is already what write_instructions would join the list into
+        pulse_generator.write_instructions(self.instruction_block)
         pulse_generator.write_device_options(final_address=self.final_address)
 
 
@@ -166,18 +466,19 @@ class Channel:
     def __init__(self, channel_number: int, compiler: Compiler):
         self.channel = channel_number
         self.compiler = compiler
+        self._bit = 1 << channel_number  # This channel's bit in a state mask
 
     def high(self, t: float, stop_and_wait=None, hardware_trig_out=None, notify_computer=None, powerline_sync=None, time_unit='seconds'):
         """
         Schedule the channel to go high at the specified absolute time.
         """
-        self.compiler.add_update(t, {self.channel: True}, stop_and_wait, hardware_trig_out, notify_computer, powerline_sync, time_unit)
+        self.compiler._add_masks(t, self._bit, 0, stop_and_wait, hardware_trig_out, notify_computer, powerline_sync, time_unit)
 
     def low(self, t: float, stop_and_wait=None, hardware_trig_out=None, notify_computer=None, powerline_sync=None, time_unit='seconds'):
         """
         Schedule the channel to go low at the specified absolute time.
         """
-        self.compiler.add_update(t, {self.channel: False}, stop_and_wait, hardware_trig_out, notify_computer, powerline_sync, time_unit)
+        self.compiler._add_masks(t, 0, self._bit, stop_and_wait, hardware_trig_out, notify_computer, powerline_sync, time_unit)
 
     def pulse_high(self, t: float, duration_high: int, duration_low: int = 0, N: int = 1, flags_mode: str = "start", stop_and_wait=None, hardware_trig_out=None, notify_computer=None, powerline_sync=None, time_unit='seconds') -> float:
         """
@@ -223,55 +524,26 @@ class Channel:
         # Do the conversion to clock_cycles here so it only has to be done once. Not evey call to add_update.
         time_unit_returned = time_unit
         if time_unit == 'seconds':
-            t = int(round(t/Compiler.CLOCK_PERIOD))
-            duration_first_segment = int(round(duration_first_segment/Compiler.CLOCK_PERIOD))
-            duration_second_segment = int(round(duration_second_segment/Compiler.CLOCK_PERIOD))
+            t = Compiler._to_cycles(t)
+            duration_first_segment = Compiler._to_cycles(duration_first_segment)
+            duration_second_segment = Compiler._to_cycles(duration_second_segment)
         else:
             t = int(t)
             duration_first_segment = int(duration_first_segment)
             duration_second_segment = int(duration_second_segment)
 
-        if first_segment_high:
-            first_segment_level = True
-            second_segment_level = False
-        else:
-            first_segment_level = False
-            second_segment_level = True
-    
         if N < 1:
             return 0 # Does not do anything and the duration is 0
         if N > 1 and duration_second_segment <= 0:
             raise ValueError("For N > 1, duration_low must be greater than 0.")
 
-        if flags_mode == 'start':
-            pulse_start = t
-            self.compiler.add_update(pulse_start, {self.channel: first_segment_level}, stop_and_wait, hardware_trig_out, notify_computer, powerline_sync, time_unit='clock_cycles')
-            self.compiler.add_update(pulse_start + duration_first_segment, {self.channel: second_segment_level}, time_unit='clock_cycles')
-            pulse_start += (duration_first_segment + duration_second_segment)
-            for i in range(N - 1):
-                # Only runs if N > 1
-                self.compiler.add_update(pulse_start, {self.channel: first_segment_level}, time_unit='clock_cycles')
-                self.compiler.add_update(pulse_start + duration_first_segment, {self.channel: second_segment_level}, time_unit='clock_cycles')
-                pulse_start += (duration_first_segment + duration_second_segment)
-        elif flags_mode == 'every':
-            pulse_start = t
-            for i in range(N):
-                # Runs if N >= 1
-                self.compiler.add_update(pulse_start, {self.channel: first_segment_level}, stop_and_wait, hardware_trig_out, notify_computer, powerline_sync, time_unit='clock_cycles')
-                self.compiler.add_update(pulse_start + duration_first_segment, {self.channel: second_segment_level}, time_unit='clock_cycles')
-                pulse_start += (duration_first_segment + duration_second_segment)
-        elif flags_mode == 'end':
-            pulse_start = t
-            for i in range(N - 1):
-                # Only runs if N > 1
-                self.compiler.add_update(pulse_start, {self.channel: first_segment_level}, time_unit='clock_cycles')
-                self.compiler.add_update(pulse_start + duration_first_segment, {self.channel: second_segment_level}, time_unit='clock_cycles')
-                pulse_start += (duration_first_segment + duration_second_segment)
-            self.compiler.add_update(pulse_start, {self.channel: first_segment_level})
-            self.compiler.add_update(pulse_start + duration_first_segment, {self.channel: second_segment_level}, stop_and_wait, hardware_trig_out, notify_computer, powerline_sync, time_unit='clock_cycles')
+        # Most pulses carry no flags, in which case there is no need to build the flags dict at all
+        if stop_and_wait is None and hardware_trig_out is None and notify_computer is None and powerline_sync is None:
+            flags = None
         else:
-            raise ValueError("Invalid value for flags_mode. Valid entries are \"start\", \"evey\", \"end\"")
-        
+            flags = {'stop_and_wait':stop_and_wait, 'hardware_trig_out':hardware_trig_out, 'notify_computer':notify_computer, 'powerline_sync':powerline_sync}
+        self.compiler.add_pulse_train(self.channel, t, duration_first_segment, duration_second_segment, N, first_segment_high, flags, flags_mode)
+
         if N == 1:
             total_duration = duration_first_segment
         else:
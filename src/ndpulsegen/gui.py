@@ -1,11 +1,15 @@
 # gui.py (with explicit "Manual outputs" group for per-channel control)
 from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
 import sys
-import struct
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from typing import Optional, List, Dict, Any
 import json
+import re
+
+import numpy as np
 
 from PyQt5.QtCore import (
     Qt, QObject, QThread, pyqtSignal, QTimer, QSettings, QSize
@@ -14,7 +18,7 @@ from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
     QPushButton, QComboBox, QLabel, QAction, QToolBar, QGroupBox, QCheckBox,
     QTextEdit, QDoubleSpinBox, QLineEdit, QMessageBox, QScrollArea, QFrame,
-    QSizePolicy,
+    QSizePolicy, QButtonGroup,
 )
 
 
@@ -23,20 +27,40 @@ import serial.tools.list_ports
 
 from . import transcode
 
+# Indicator stylesheets, built once so every call passes Qt the same string
+_QSS_ON = "background-color: green; border-radius: 8px;"
+_QSS_OFF = "background-color: red; border-radius: 8px;"
+
+# The accept_hardware_trigger modes, in the order they are listed in the GUI
+_ACCEPT_HW_MODES = ("never", "always", "single_run", "once")
+
+# One entry of a channel list: a channel ("5") or an inclusive range ("3-7"). Signs are accepted where int()
+# would accept them, so a range end such as "3--2" still parses (and is clamped to the valid channels).
+_CHANNEL_RANGE_RE = re.compile(r"(\+?\d+)(?:-([+-]?\d+))?")
+
+
+@lru_cache(maxsize=256)
+def _state_bits_to_int(bits: bytes) -> int:
+    """Pack the raw bytes of decode_devicestate's 0/1 state array into an int bitfield (bit i is channel i)."""
+    return int.from_bytes(np.packbits(np.frombuffer(bits, dtype=np.uint8), bitorder='little').tobytes(), 'little')
+
 
 class SerialWorker(QObject):
     messageReceived = pyqtSignal(dict)
-    devicestate = pyqtSignal(dict)
-    powerlinestate = pyqtSignal(dict)
-    devicestate_extras = pyqtSignal(dict)
-    notification = pyqtSignal(dict)
-    echo = pyqtSignal(dict)
-    easyprint = pyqtSignal(dict)
-    internalError = pyqtSignal(dict)
-    bytesDropped = pyqtSignal(int, float)
+    # Every message decoded from one read, as a list of (message id, decoded) tuples. Emitting them together
+    # means one queued cross-thread hop per read rather than one per message. Declared as object so the list
+    # is passed across as a reference, rather than converted to a QVariantList and back.
+    framesReceived = pyqtSignal(object)
+    bytesDropped = pyqtSignal(int, "qint64")  # message id, time.monotonic_ns() (a plain int would overflow)
     errorOccurred = pyqtSignal(str)
     finished = pyqtSignal()
 
+    # How long to wait for the rest of a partly received message before dropping it
+    PARTIAL_TIMEOUT_S = 0.1
+    # Read timeout of the port. It is set once before the port is opened and never changed by the worker, since
+    # changing it reconfigures the whole port. Being finite, it also bounds how long stop() can take to be seen.
+    READ_TIMEOUT_S = 1.0
+
     def __init__(self, ser: serial.Serial, parent: Optional[QObject] = None):
         super().__init__(parent)
         self.ser = ser
@@ -50,53 +74,73 @@ class SerialWorker(QObject):
             pass
 
     def run(self):
+        # Bytes read from the port but not yet parsed into messages. Reading everything that is waiting
+        # in one call, rather than one byte and then the rest of the message, keeps the number of reads
+        # (and USB round trips) down when the device sends several messages at once.
+        buf = bytearray()
+        # Nothing connects to the generic signal by default, so skip the emit (and its queued cross-thread
+        # dispatch) unless something does. Connections are made before the worker is started.
+        emit_generic = self.receivers(self.messageReceived) > 0
+        # Everything used per message is bound to a local name once, rather than looked up on each pass
+        ser = self.ser
+        read = ser.read
+        now = time.monotonic_ns
+        decode_messages = transcode.decode_messages
+        emit_message = self.messageReceived.emit
+        emit_frames = self.framesReceived.emit
+        emit_dropped = self.bytesDropped.emit
+        emit_error = self.errorOccurred.emit
+        # When the partial message now in buf was received. It is dropped once it has waited PARTIAL_TIMEOUT_S
+        # for the rest, so a stray byte that looks like an identifier can't stall the parser.
+        partial_ts = 0
+        partial_timeout_ns = int(self.PARTIAL_TIMEOUT_S * 1e9)
         try:
             while self._running:
+                # Blocks until data arrives or the read times out (stop() also cancels the read where it can)
                 try:
-                    b = self.ser.read(1)
+                    chunk = read(max(1, ser.in_waiting))
                 except serial.serialutil.SerialException as ex:
-                    self.errorOccurred.emit(str(ex))
+                    emit_error(str(ex))
                     break
-                if not b:
+                # One timestamp per read, in integer nanoseconds; messages are only stamped for logging
+                ts = now()
+                if buf and ts - partial_ts >= partial_timeout_ns:
+                    # The rest of this message never arrived in time, so it will never be completed
+                    emit_dropped(buf[0], ts)
+                    buf.clear()
+                if not chunk:
                     continue
-                ts = time.time()
-                msg_id = b[0]
-                dinfo = transcode.msgin_decodeinfo.get(msg_id)
-                if not dinfo:
-                    self.bytesDropped.emit(msg_id, ts)
-                    continue
-                remaining = dinfo["message_length"] - 1
-                try:
-                    payload = self.ser.read(remaining)
-                except serial.serialutil.SerialException as ex:
-                    self.errorOccurred.emit(str(ex))
-                    break
-                if len(payload) != remaining:
-                    self.bytesDropped.emit(msg_id, ts)
-                    continue
-                try:
-                    decoded = dinfo["decode_function"](payload)
-                except Exception as ex:
-                    self.errorOccurred.emit(f"Decode failed for id {msg_id}: {ex}")
-                    continue
-                decoded["timestamp"] = ts
-                decoded["message_type"] = dinfo["message_type"]
-                self.messageReceived.emit(decoded)
-                mtype = dinfo["message_type"]
-                if mtype == "devicestate":
-                    self.devicestate.emit(decoded)
-                elif mtype == "powerlinestate":
-                    self.powerlinestate.emit(decoded)
-                elif mtype == "devicestate_extras":
-                    self.devicestate_extras.emit(decoded)
-                elif mtype == "notification":
-                    self.notification.emit(decoded)
-                elif mtype == "echo":
-                    self.echo.emit(decoded)
-                elif mtype == "print":
-                    self.easyprint.emit(decoded)
-                elif mtype == 'error':
-                    self.internalError.emit(decoded)
+                # Usually nothing is left over from the previous read, so parse the bytes read directly, and only
+                # copy them into buf when they have to be joined onto a partial message.
+                if buf:
+                    buf.extend(chunk)
+                    data = buf
+                else:
+                    data = chunk
+                pos = 0
+                frames = []
+                for pos, msg_id, mtype, decoded in decode_messages(data):
+                    if mtype is None:
+                        emit_dropped(msg_id, ts)
+                        continue
+                    if isinstance(decoded, Exception):
+                        emit_error(f"Decode failed for id {msg_id}: {decoded}")
+                        continue
+                    decoded["timestamp"] = ts
+                    decoded["message_type"] = mtype
+                    if emit_generic:
+                        emit_message(decoded)
+                    frames.append((msg_id, decoded))
+                if data is buf:
+                    del buf[:pos]
+                    if pos and buf:
+                        # The old partial message was completed, and the leftover is a new one
+                        partial_ts = ts
+                elif pos < len(data):
+                    buf.extend(chunk[pos:])
+                    partial_ts = ts
+                if frames:
+                    emit_frames(frames)
         finally:
             self.finished.emit()
 
@@ -109,24 +153,77 @@ class PulseGenerator(QObject):
     echo = pyqtSignal(dict)
     easyprint = pyqtSignal(dict)
     internalError = pyqtSignal(dict)
-    bytesDropped = pyqtSignal(int, float)
+    bytesDropped = pyqtSignal(int, "qint64")  # message id, time.monotonic_ns() (a plain int would overflow)
     errorOccurred = pyqtSignal(str)
     connected = pyqtSignal(str)
     disconnected = pyqtSignal()
 
+    # Signals that are re-emitted from the SerialWorker
+    _FORWARDED_SIGNALS = ("bytesDropped", "errorOccurred")
+    # Byte the device is asked to echo back when checking that a port is a Pulse Gen
+    _ECHO_CHECK_BYTE = b"\xd1"
+    # Most ports that can be handshaken with at once
+    _MAX_HANDSHAKE_WORKERS = 8
+
     def __init__(self, parent: Optional[QObject] = None):
         super().__init__(parent)
         self.ser = serial.Serial()
-        self.ser.timeout = 0.1
+        # Set before the port is ever opened; the reader never changes it (see SerialWorker.READ_TIMEOUT_S)
+        self.ser.timeout = SerialWorker.READ_TIMEOUT_S
         self.ser.write_timeout = 1
         self.ser.baudrate = 12000000
 
+        # The reader thread never writes, so this isn't protecting pyserial's read against write. It guards
+        # _write_buf, since write_command may also be called from threads other than the GUI thread, and keeps
+        # each flushed block in one piece on the wire. It is uncontended in normal GUI use.
         self._write_lock = threading.Lock()
+        # Commands written during one pass of the event loop are sent together in a single write,
+        # rather than one USB transfer each.
+        self._write_buf = bytearray()
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(0)
+        self._flush_timer.timeout.connect(self.flush)
         self._thread: Optional[QThread] = None
+        # The signal emitted for each message type
+        self._type_signals = {
+            "devicestate": self.devicestate,
+            "powerlinestate": self.powerlinestate,
+            "devicestate_extras": self.devicestate_extras,
+            "notification": self.notification,
+            "echo": self.echo,
+            "print": self.easyprint,
+            "error": self.internalError,
+        }
+        # The same, as each signal's emit method indexed by message id
+        self._emit_by_id = tuple(
+            self._type_signals[entry[1]].emit if entry and entry[1] in self._type_signals else None
+            for entry in transcode.msgin_decodetable
+        )
         self._worker: Optional[SerialWorker] = None
 
         self._valid_vid = 1027
         self._valid_pid = 24592
+        # Handshake results from previous scans, keyed by (port, USB serial number)
+        self._device_cache: Dict[Any, Dict[str, Any]] = {}
+
+        # The status poll is sent every POLL_MS and never changes, so encode it once
+        self._poll_cmd = transcode.encode_action(request_state=True, request_powerline_state=True, request_state_extras=True)
+        self._echo_cmd = transcode.encode_echo(self._ECHO_CHECK_BYTE)
+        # The GUI's option controls only ever send one of a few fixed commands, so encode them all up front
+        self._accept_hw_cmds = {
+            mode: transcode.encode_device_options(accept_hardware_trigger=mode)
+            for mode in _ACCEPT_HW_MODES
+        }
+        self._notify_finished_cmds = {
+            on: transcode.encode_device_options(notify_when_run_finished=on) for on in (True, False)
+        }
+        self._notify_main_trig_out_cmds = {
+            on: transcode.encode_device_options(notify_on_main_trig_out=on) for on in (True, False)
+        }
+        self._wait_cmds = {
+            on: transcode.encode_powerline_trigger_options(trigger_on_powerline=on) for on in (True, False)
+        }
 
         self.serial_number_save: Optional[int] = None
         self.device_type: Optional[int] = None
@@ -140,15 +237,12 @@ class PulseGenerator(QObject):
         self._thread = QThread()
         self._worker = SerialWorker(self.ser)
         self._worker.moveToThread(self._thread)
-        self._worker.devicestate.connect(self.devicestate)
-        self._worker.powerlinestate.connect(self.powerlinestate)
-        self._worker.devicestate_extras.connect(self.devicestate_extras)
-        self._worker.notification.connect(self.notification)
-        self._worker.echo.connect(self.echo)
-        self._worker.easyprint.connect(self.easyprint)
-        self._worker.internalError.connect(self.internalError)
-        self._worker.bytesDropped.connect(self.bytesDropped)
-        self._worker.errorOccurred.connect(self.errorOccurred)
+        # The worker is recreated on every connect, while the GUI connects to this object's signals once, so
+        # they can't simply be aliased to the worker's. Forwarding costs a single queued hop into the GUI
+        # thread, after which this object's signals are emitted directly.
+        for name in self._FORWARDED_SIGNALS:
+            getattr(self._worker, name).connect(getattr(self, name))
+        self._worker.framesReceived.connect(self._dispatch_frames)
         self._thread.started.connect(self._worker.run)
         self._worker.finished.connect(self._thread.quit)
         self._worker.finished.connect(self._worker.deleteLater)
@@ -156,6 +250,14 @@ class PulseGenerator(QObject):
         self._thread.start()
         self.connected.emit(self.ser.port)
 
+    def _dispatch_frames(self, frames: list):
+        # Runs in the GUI thread, so these emits call the connected slots directly
+        emit_by_id = self._emit_by_id
+        for msg_id, decoded in frames:
+            emit = emit_by_id[msg_id]
+            if emit is not None:
+                emit(decoded)
+
     def _stop_reader(self):
         if self._worker:
             self._worker.stop()
@@ -166,6 +268,7 @@ class PulseGenerator(QObject):
         self._thread = None
 
     def disconnect(self):
+        self.flush()
         try:
             self._stop_reader()
         finally:
@@ -175,7 +278,12 @@ class PulseGenerator(QObject):
             finally:
                 self.disconnected.emit()
 
-    def connect(self, serial_number: Optional[int] = None, port: Optional[str] = None) -> bool:
+    def connect(self, serial_number: Optional[int] = None, port: Optional[str] = None, device: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Connect to a device by serial number, by port, or (if neither is given) the first one found.
+        A device entry already returned by get_connected_devices can be passed as `device` to connect
+        to it directly, without enumerating and handshaking with every port again.
+        """
         if self.is_open():
             try:
                 self.ser.reset_input_buffer()
@@ -184,9 +292,9 @@ class PulseGenerator(QObject):
                 pass
             return True
 
-        target_port = None
-        device_meta = None
-        if serial_number is not None or port is None:
+        target_port = device["comport"] if device else None
+        device_meta = device
+        if target_port is None and (serial_number is not None or port is None):
             devices = self.get_connected_devices()["validated_devices"]
             for d in devices:
                 if (serial_number is not None and d.get("serial_number") == serial_number) or (
@@ -216,19 +324,35 @@ class PulseGenerator(QObject):
     def get_connected_devices(self) -> Dict[str, Any]:
         validated_devices = []
         unvalidated = []
-        comports = list(serial.tools.list_ports.comports())
+        # grep matches the VID:PID in the port's hardware id, which skips describing unrelated ports
+        comports = serial.tools.list_ports.grep(f"{self._valid_vid:04X}:{self._valid_pid:04X}")
         valid_ports = [
             cp
             for cp in comports
             if getattr(cp, "vid", None) == self._valid_vid and getattr(cp, "pid", None) == self._valid_pid
         ]
-        for cp in valid_ports:
-            ok, meta = self._try_handshake(cp.device)
-            if ok and meta:
-                meta["comport"] = cp.device
-                validated_devices.append(meta)
-            else:
-                unvalidated.append(cp.device)
+        # A port that is still present with the same USB serial number is still the same Pulse Gen, so only
+        # ports that have appeared (or failed last time) since the previous scan need a handshake
+        keys = [(cp.device, getattr(cp, "serial_number", None)) for cp in valid_ports]
+        self._device_cache = {key: meta for key, meta in self._device_cache.items() if key in keys}
+        new_ports = [key[0] for key in keys if key not in self._device_cache]
+        # Each handshake mostly waits on its port, so run them all at once rather than one after another
+        if new_ports:
+            with ThreadPoolExecutor(max_workers=min(self._MAX_HANDSHAKE_WORKERS, len(new_ports))) as executor:
+                results = dict(zip(new_ports, executor.map(self._try_handshake, new_ports)))
+        else:
+            results = {}
+        for key in keys:
+            port = key[0]
+            meta = self._device_cache.get(key)
+            if meta is None:
+                ok, meta = results[port]
+                if not (ok and meta):
+                    unvalidated.append(port)
+                    continue
+                meta["comport"] = port
+                self._device_cache[key] = meta
+            validated_devices.append(dict(meta))
         return {"validated_devices": validated_devices, "unvalidated_devices": unvalidated}
 
     def _try_handshake(self, port: str, timeout_s: float = 1.0):
@@ -244,29 +368,26 @@ class PulseGenerator(QObject):
         try:
             s.reset_input_buffer()
             s.reset_output_buffer()
-            check_byte = bytes([209])
-            s.write(transcode.encode_echo(check_byte))
+            s.write(self._echo_cmd)
+            # Read whatever has arrived and split it into messages in memory, as SerialWorker.run does
+            buf = bytearray()
             t0 = time.time()
             while time.time() - t0 < timeout_s:
-                b = s.read(1)
-                if not b:
-                    continue
-                msg_id = b[0]
-                dinfo = transcode.msgin_decodeinfo.get(msg_id)
-                if not dinfo:
-                    continue
-                remaining = dinfo["message_length"] - 1
-                payload = s.read(remaining)
-                if len(payload) != remaining:
+                chunk = s.read(max(1, s.in_waiting))
+                if not chunk:
                     continue
-                decoded = dinfo["decode_function"](payload)
-                if dinfo["message_type"] == "echo" and decoded.get("echoed_byte") == check_byte:
-                    return True, {
-                        "device_type": decoded.get("device_type"),
-                        "hardware_version": decoded.get("hardware_version"),
-                        "firmware_version": decoded.get("firmware_version"),
-                        "serial_number": decoded.get("serial_number"),
-                    }
+                buf.extend(chunk)
+                pos = 0
+                for pos, _, mtype, decoded in transcode.decode_messages(buf):
+                    if (mtype == "echo" and not isinstance(decoded, Exception)
+                            and decoded.get("echoed_byte") == self._ECHO_CHECK_BYTE):
+                        return True, {
+                            "device_type": decoded.get("device_type"),
+                            "hardware_version": decoded.get("hardware_version"),
+                            "firmware_version": decoded.get("firmware_version"),
+                            "serial_number": decoded.get("serial_number"),
+                        }
+                del buf[:pos]
             return False, None
         finally:
             try:
@@ -275,10 +396,36 @@ class PulseGenerator(QObject):
                 pass
 
     def write_command(self, encoded_command: bytes):
+        """
+        Queue an encoded command to be sent by flush() on the next pass of the event loop (or immediately, when
+        called from another thread). Only a closed port raises here; write failures happen later and are
+        reported through errorOccurred.
+        """
         if not self.is_open():
             raise serial.serialutil.PortNotOpenError("Serial port is not open")
         with self._write_lock:
-            self.ser.write(encoded_command)
+            self._write_buf += encoded_command
+        if QThread.currentThread() is not self.thread():
+            # The flush timer can only be started from this object's thread
+            self.flush()
+        elif not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def flush(self):
+        """Send any commands still waiting to be written, now."""
+        if QThread.currentThread() is self.thread():
+            self._flush_timer.stop()
+        with self._write_lock:
+            if not self._write_buf:
+                return
+            data = bytes(self._write_buf)
+            self._write_buf.clear()
+            if not self.is_open():
+                return
+            try:
+                self.ser.write(data)
+            except serial.serialutil.SerialException as ex:
+                self.errorOccurred.emit(str(ex))
 
     def write_echo(self, byte_to_echo: bytes):
         self.write_command(transcode.encode_echo(byte_to_echo))
@@ -332,11 +479,33 @@ class PulseGenerator(QObject):
             )
         )
 
+    def write_poll(self):
+        """Request the device state, powerline state and state extras in one command."""
+        self.write_command(self._poll_cmd)
+
+    # Pre-encoded single-option commands used by the GUI controls. write_device_options and
+    # write_powerline_trigger_options remain the general API.
+    def write_accept_hardware_trigger(self, mode: str):
+        self.write_command(self._accept_hw_cmds[mode])
+
+    def write_notify_when_run_finished(self, on: bool):
+        self.write_command(self._notify_finished_cmds[bool(on)])
+
+    def write_notify_on_main_trig_out(self, on: bool):
+        self.write_command(self._notify_main_trig_out_cmds[bool(on)])
+
+    def write_trigger_on_powerline(self, on: bool):
+        self.write_command(self._wait_cmds[bool(on)])
+
     def write_general_debug(self, message: bytes):
         self.write_command(transcode.encode_general_debug(message))
 
-    def write_static_state(self, state: List[bool]):
-        self.write_command(transcode.encode_static_state(state))
+    def write_static_state(self, state):
+        if isinstance(state, int):
+            # The GUI keeps the state as an int bitmask, which needs no format conversion
+            self.write_command(transcode.encode_static_state_bits(state))
+        else:
+            self.write_command(transcode.encode_static_state(state))
 
     def write_instructions(self, instructions: List[bytes]):
         if hasattr(transcode, "encode_instructions"):
@@ -483,7 +652,38 @@ class TickSpinBox(QDoubleSpinBox):
 
 
 class MainWindow(QMainWindow):
+    # Poll interval until the first devicestate, then the interval while a run is / is not active
     POLL_MS = 100
+    POLL_MS_RUNNING = 50
+    POLL_MS_IDLE = 1000
+    # A poll is skipped if the device sent its state unprompted within this fraction of the poll interval, but
+    # never when the last poll went out POLL_MS_IDLE or more ago (the poll also fetches the powerline state and
+    # run time, which the device never sends unprompted)
+    POLL_SKIP_FRACTION = 0.8
+    # Polls stop being sent while this many are unanswered, unless no reply has arrived for POLL_STALL_S
+    MAX_POLLS_IN_FLIGHT = 2
+    POLL_STALL_S = 1.0
+    UI_UPDATE_MS = 50
+    NOTIF_LOG_MAX_LINES = 2000
+    SETTINGS_WRITE_DELAY_MS = 500
+
+    # How each devicestate field is shown: (field, widget attribute, setter method name, value conversion).
+    # A conversion given as a str names a method of MainWindow.
+    _DEVICESTATE_SPEC = (
+        ("running", "runningIndicator", "setStyleSheet", "_indicator_qss"),
+        ("software_run_enable", "softwareRunEnable", "setStyleSheet", "_indicator_qss"),
+        ("hardware_run_enable", "hardwareRunEnable", "setStyleSheet", "_indicator_qss"),
+        ("current_address", "currentAddrLabel", "setText", str),
+        ("final_address", "finalAddrLabel", "setText", str),
+        # decode_devicestate only produces modes that are listed in the combo
+        ("accept_hardware_trigger", "acceptHwCombo", "setCurrentIndex", "_accept_hw_index"),
+        ("clock_source", "refClockLabel", "setText", str),
+        # Notification checkboxes (note naming from decode_devicestate)
+        ("notify_on_run_finished", "notifyFinishedCheckbox", "setChecked", bool),
+        ("notify_on_main_trig_out", "notifyMainTrigOutCheckbox", "setChecked", bool),
+        ("trigger_out_length", "trigOutLenSpin", "set_value_from_ticks", int),
+        ("trigger_out_delay", "trigOutDelaySpin", "set_value_from_ticks", int),
+    )
 
     def __init__(self):
         super().__init__()
@@ -491,11 +691,26 @@ class MainWindow(QMainWindow):
         self.resize(1220, 840)
 
         self.settings = QSettings("ndpulsegen", "gui")
+        # Settings edits are collected here and written together once editing pauses, since each
+        # setValue can be a registry/disk write
+        self._pending_settings: Dict[str, Any] = {}
+        self._settings_timer = QTimer(self)
+        self._settings_timer.setSingleShot(True)
+        self._settings_timer.setInterval(self.SETTINGS_WRITE_DELAY_MS)
+        self._settings_timer.timeout.connect(self.flush_settings)
         self.pg = PulseGenerator(self)
 
-        self.pg.devicestate.connect(self.on_devicestate)
-        self.pg.powerlinestate.connect(self.on_powerlinestate)
-        self.pg.devicestate_extras.connect(self.on_devicestate_extras)
+        # Status messages are held here (latest per slot) and applied to the widgets together by a short
+        # timer, so a burst of replies costs one UI update rather than one per message
+        self._pending_ui: Dict[Any, dict] = {}
+        self._ui_timer = QTimer(self)
+        self._ui_timer.setSingleShot(True)
+        self._ui_timer.setInterval(self.UI_UPDATE_MS)
+        self._ui_timer.timeout.connect(self._apply_pending_ui)
+
+        self.pg.devicestate.connect(partial(self._queue_ui, self.on_devicestate))
+        self.pg.powerlinestate.connect(partial(self._queue_ui, self.on_powerlinestate))
+        self.pg.devicestate_extras.connect(partial(self._queue_ui, self.on_devicestate_extras))
         self.pg.notification.connect(self.on_notification)
         self.pg.echo.connect(self.on_echo)
         self.pg.easyprint.connect(self.on_easyprint)
@@ -530,6 +745,10 @@ class MainWindow(QMainWindow):
         # ---- Manual outputs group (top half) ----
         channelGrid = QGridLayout()
         self.channelWidgets = []  # list of (QLineEdit, QPushButton)
+        # One non-exclusive group reports clicks on all channel buttons, rather than a handler per button
+        self._channelButtonGroup = QButtonGroup(self)
+        self._channelButtonGroup.setExclusive(False)
+        self._channelButtonGroup.buttonClicked.connect(self.on_channel_clicked)
         for i in range(24):
             container = QWidget()
             vbox = QVBoxLayout(container)
@@ -542,18 +761,46 @@ class MainWindow(QMainWindow):
                 saved = ""
             label_edit.setText(saved)
             label_edit.editingFinished.connect(
-                lambda i=i, e=label_edit: self.settings.setValue(f"channels/{i}", e.text())
+                lambda i=i, e=label_edit: self._queue_setting(f"channels/{i}", e.text())
             )
             vbox.addWidget(label_edit)
 
             btn = QPushButton(str(i))
             btn.setCheckable(True)
-            btn.clicked.connect(self.make_toggle_handler(i))
+            self._channelButtonGroup.addButton(btn, i)
             vbox.addWidget(btn)
 
             self.channelWidgets.append((label_edit, btn))
             row, col = divmod(i, 8)
             channelGrid.addWidget(container, row, col)
+        self._channel_buttons = [btn for _, btn in self.channelWidgets]
+
+        # Toggles are sent on the next pass of the event loop, so several quick toggles go out as one state
+        self._state_timer = QTimer(self)
+        self._state_timer.setSingleShot(True)
+        self._state_timer.setInterval(0)
+        self._state_timer.timeout.connect(self.send_static_state)
+        # The output state (bit i is channel i) last sent to, or reported by, the device
+        self._last_state_int: Optional[int] = None
+        # The state the channel buttons show, kept up to date as they change so it never has to be read back
+        self._state_bits = 0
+        # When the user last changed the outputs (time.monotonic_ns, as the message timestamps)
+        self._last_local_state_ns = 0
+        # The last devicestate shown, so unchanged fields can be skipped
+        self._last_ds: Dict[str, Any] = {}
+        # When the last devicestate arrived, and when the last one that wasn't a reply to a poll arrived
+        # (time.monotonic). Only the unsolicited ones make a poll redundant.
+        self._last_ds_ts = 0.0
+        self._last_unsolicited_ds_ts = 0.0
+        # When the last poll was sent (time.monotonic)
+        self._last_poll_ts = 0.0
+        # Polls sent that have not yet been answered by a devicestate
+        self._polls_in_flight = 0
+        # Whether the last devicestate showed a run in progress (None until one arrives)
+        self._was_running: Optional[bool] = None
+        # The last powerlinestate and run time shown
+        self._last_pls: Dict[str, Any] = {}
+        self._last_run_time: Optional[int] = None
 
         manualBox = QGroupBox("Manual outputs")
         manualLayout = QVBoxLayout(manualBox)
@@ -664,7 +911,8 @@ class MainWindow(QMainWindow):
         inLayout = QGridLayout(inBox)
         inLayout.addWidget(QLabel("Accept hardware trigger:"), 0, 0)
         self.acceptHwCombo = QComboBox()
-        self.acceptHwCombo.addItems(["never", "always", "single_run", "once"])
+        self.acceptHwCombo.addItems(_ACCEPT_HW_MODES)
+        self._acceptHwIdx = {mode: i for i, mode in enumerate(_ACCEPT_HW_MODES)}
         self.acceptHwCombo.currentTextChanged.connect(self.on_accept_hw_changed)
         inLayout.addWidget(self.acceptHwCombo, 0, 1)
         inLayout.addWidget(QLabel("Wait for powerline:"), 1, 0)
@@ -721,6 +969,8 @@ class MainWindow(QMainWindow):
         notifLayout.addWidget(QLabel("Incoming Notifications"), 2, 0)
         self.notifLog = QTextEdit()
         self.notifLog.setReadOnly(True)
+        # Keep only the most recent lines so long sessions don't grow the document without bound
+        self.notifLog.document().setMaximumBlockCount(self.NOTIF_LOG_MAX_LINES)
         notifLayout.addWidget(self.notifLog, 3, 0, 1, 2)
 
         # Two columns
@@ -756,9 +1006,18 @@ class MainWindow(QMainWindow):
 
         self.setCentralWidget(scroll)
 
+        # Resolve the devicestate spec to the widgets' bound blockSignals and setter methods once, keyed by field
+        self._ds_handlers = {}
+        for key, widget_attr, setter_name, cast in self._DEVICESTATE_SPEC:
+            widget = getattr(self, widget_attr)
+            if isinstance(cast, str):
+                cast = getattr(self, cast)
+            self._ds_handlers[key] = (widget.blockSignals, getattr(widget, setter_name), cast)
+
         # Timer
         self.request_timer = QTimer(self)
         self.request_timer.setInterval(self.POLL_MS)
+        self.request_timer.setTimerType(Qt.PreciseTimer)
         self.request_timer.timeout.connect(self.poll_status)
 
         # Initial device scan
@@ -771,30 +1030,38 @@ class MainWindow(QMainWindow):
 
     # Helpers
     @staticmethod
-    def _set_indicator(widget: QLabel, on: bool):
-        widget.setStyleSheet(
-            "background-color: green; border-radius: 8px;"
-            if on
-            else "background-color: red; border-radius: 8px;"
-        )
-
-    def _state_to_bools(self, state_val) -> List[bool]:
-        """
-        Convert the 'state' field from decode_devicestate into a 24-element bool list.
+    def _indicator_qss(on) -> str:
+        return _QSS_ON if on else _QSS_OFF
 
-        decode_devicestate currently returns a NumPy array of bits, but we also
-        support an int bitfield for robustness.
-        """
-        if isinstance(state_val, int):
-            return [bool((state_val >> i) & 1) for i in range(24)]
-        # assume iterable / NumPy array
-        return [bool(state_val[i]) for i in range(24)]
+    def _accept_hw_index(self, mode: str) -> int:
+        return self._acceptHwIdx[mode]
 
-    def _apply_state_to_buttons(self, state_bools: List[bool]):
-        for i, (_, btn) in enumerate(self.channelWidgets):
+    def _apply_state_to_buttons(self, state_int: int, ts_ns: int):
+        if ts_ns < self._last_local_state_ns:
+            # Received before the user last changed the outputs (devicestates are applied up to UI_UPDATE_MS
+            # after they arrive), so it would revert that change
+            return
+        self._last_state_int = state_int
+        if self._state_timer.isActive():
+            # A toggle is waiting to be sent; don't overwrite it with the older device state
+            return
+        if state_int == self._state_bits:
+            # The buttons already show this state (the common case between polls)
+            return
+        self._set_buttons(state_int)
+
+    def _set_buttons(self, state_int: int):
+        # _state_bits matches what the buttons show, so only the buttons whose bit differs need to be touched
+        changed = state_int ^ self._state_bits
+        buttons = self._channel_buttons
+        while changed:
+            low_bit = changed & -changed
+            btn = buttons[low_bit.bit_length() - 1]
             old = btn.blockSignals(True)
-            btn.setChecked(bool(state_bools[i]))
+            btn.setChecked(bool(state_int & low_bit))
             btn.blockSignals(old)
+            changed ^= low_bit
+        self._state_bits = state_int
 
     def _make_header_label(self, text: str) -> QLabel:
         lbl = QLabel(text)
@@ -887,6 +1154,8 @@ class MainWindow(QMainWindow):
                 "name": nameEdit,
                 "on": activeHighEdit,
                 "off": activeLowEdit,
+                # Channel masks parsed from the "on"/"off" text, as {key: (text, mask)}; see _group_mask
+                "masks": {},
             }
             self.groupConfigs.append(cfg)
 
@@ -959,7 +1228,23 @@ class MainWindow(QMainWindow):
                     "off": cfg["off"].text(),
                 }
             )
-        self.settings.setValue("channel_groups", json.dumps(groups))
+        self._queue_setting("channel_groups", json.dumps(groups))
+
+    def _queue_setting(self, key: str, value):
+        self._pending_settings[key] = value
+        self._settings_timer.start()
+
+    def flush_settings(self):
+        """
+        Write any queued settings to QSettings and sync them to storage.
+        """
+        self._settings_timer.stop()
+        if not self._pending_settings:
+            return
+        for key, value in self._pending_settings.items():
+            self.settings.setValue(key, value)
+        self._pending_settings.clear()
+        self.settings.sync()
 
 
     def parse_channel_list(self, text: str) -> set:
@@ -976,47 +1261,29 @@ class MainWindow(QMainWindow):
         n_channels = len(self.channelWidgets)
 
         for part in parts:
-            if not part:
+            m = _CHANNEL_RANGE_RE.fullmatch(part)
+            if m is None:
                 continue
-            if "-" in part:
-                # Range like 3-7
-                try:
-                    start_str, end_str = part.split("-", 1)
-                    start = int(start_str)
-                    end = int(end_str)
-                except ValueError:
-                    continue
-                if start > end:
-                    start, end = end, start
-                for i in range(start, end + 1):
-                    if 0 <= i < n_channels:
-                        result.add(i)
-            else:
-                try:
-                    idx = int(part)
-                except ValueError:
-                    continue
-                if 0 <= idx < n_channels:
-                    result.add(idx)
+            start = int(m.group(1))
+            end = int(m.group(2)) if m.group(2) else start
+            if start > end:
+                start, end = end, start
+            # Clamp the range once rather than checking every index in it
+            result.update(range(max(start, 0), min(end, n_channels - 1) + 1))
 
         return result
 
     
     def on_group_action(self, cfg: dict, activate: bool):
         # (Logic remains mostly the same, just accessing cfg directly)
-        active_high = self.parse_channel_list(cfg["on"].text())
-        active_low = self.parse_channel_list(cfg["off"].text())
-
-        # Apply pattern only to channels in this group
-        for i, (_, chan_btn) in enumerate(self.channelWidgets):
-            if i in active_high:
-                old = chan_btn.blockSignals(True)
-                chan_btn.setChecked(activate)
-                chan_btn.blockSignals(old)
-            elif i in active_low:
-                old = chan_btn.blockSignals(True)
-                chan_btn.setChecked(not activate)
-                chan_btn.blockSignals(old)
+        # Apply pattern only to channels in this group (a channel in both lists is treated as active high)
+        high_mask = self._group_mask(cfg, "on")
+        low_mask = self._group_mask(cfg, "off") & ~high_mask
+        if activate:
+            state_int = (self._state_bits | high_mask) & ~low_mask
+        else:
+            state_int = (self._state_bits | low_mask) & ~high_mask
+        self._set_buttons(state_int)
 
         self.send_static_state()
 
@@ -1028,36 +1295,69 @@ class MainWindow(QMainWindow):
 
 
 
+    def _group_mask(self, cfg: dict, key: str) -> int:
+        """
+        Return the channels listed in cfg[key] as an int bitmask (bit i is channel i).
+        The text rarely changes between clicks, so the parsed mask is kept until it does.
+        """
+        text = cfg[key].text()
+        cached = cfg["masks"].get(key)
+        if cached is not None and cached[0] == text:
+            return cached[1]
+        mask = sum(1 << i for i in self.parse_channel_list(text))
+        cfg["masks"][key] = (text, mask)
+        return mask
+
     def send_static_state(self):
-        state = [btn.isChecked() for _, btn in self.channelWidgets]
+        self._last_local_state_ns = time.monotonic_ns()
+        state_int = self._state_bits
+        if state_int == self._last_state_int:
+            # The device is already outputting this state
+            return
         try:
-            self.pg.write_static_state(state)
-            self.statusBar().showMessage("Static state sent", 1000)
+            self.pg.write_static_state(state_int)
+            self._last_state_int = state_int
+            self.statusBar().showMessage("Static state queued", 1000)
         except Exception as e:
             self.statusBar().showMessage(f"Error sending static state: {e}", 3000)
 
     # UI -> Device
-    def make_toggle_handler(self, channel: int):
-        def handler(checked: bool):
-            self.send_static_state()
+    def on_channel_clicked(self, btn: QPushButton):
+        bit = 1 << self._channelButtonGroup.id(btn)
+        if btn.isChecked():
+            self._state_bits |= bit
+        else:
+            self._state_bits &= ~bit
+        self._state_timer.start()
 
-        return handler
+    def _resync_field(self, cache_attr: str, key: str):
+        """
+        Forget the last device value of a field the user has just edited, so the next poll writes whatever the
+        device reports back to the widget, even if that is unchanged (e.g. because the write failed).
+        """
+        # The cached dict is the message itself, so it is replaced rather than modified
+        cached = dict(getattr(self, cache_attr))
+        cached.pop(key, None)
+        setattr(self, cache_attr, cached)
 
     def on_accept_hw_changed(self, text: str):
+        self._resync_field("_last_ds", "accept_hardware_trigger")
         try:
-            self.pg.write_device_options(accept_hardware_trigger=text)
+            self.pg.write_accept_hardware_trigger(text)
             self.statusBar().showMessage("Updated accept_hardware_trigger", 1000)
         except Exception as e:
             self.statusBar().showMessage(f"Error: {e}", 3000)
 
     def on_wait_changed(self, state: int):
+        self._resync_field("_last_pls", "trig_on_powerline")
         try:
-            self.pg.write_powerline_trigger_options(trigger_on_powerline=bool(state))
+            self.pg.write_trigger_on_powerline(bool(state))
             self.statusBar().showMessage("Updated trigger_on_powerline", 1000)
         except Exception as e:
             self.statusBar().showMessage(f"Error: {e}", 3000)
 
     def on_delay_changed(self):
+        self._resync_field("_last_pls", "powerline_trigger_delay")
         # Use helper to get exact ticks
         value_clock_cycles = self.delaySpin.get_ticks()
         try:
@@ -1067,6 +1367,7 @@ class MainWindow(QMainWindow):
             self.statusBar().showMessage(f"Error: {e}", 3000)
 
     def on_trigout_len_changed(self):
+        self._resync_field("_last_ds", "trigger_out_length")
         value_clock_cycles = self.trigOutLenSpin.get_ticks()
         try:
             self.pg.write_device_options(trigger_out_length=value_clock_cycles)
@@ -1075,6 +1376,7 @@ class MainWindow(QMainWindow):
             self.statusBar().showMessage(f"Error: {e}", 3000)
 
     def on_trigout_delay_changed(self):
+        self._resync_field("_last_ds", "trigger_out_delay")
         value_clock_cycles = self.trigOutDelaySpin.get_ticks()
         try:
             self.pg.write_device_options(trigger_out_delay=value_clock_cycles)
@@ -1083,15 +1385,17 @@ class MainWindow(QMainWindow):
             self.statusBar().showMessage(f"Error: {e}", 3000)
 
     def on_notify_finished_changed(self, state: int):
+        self._resync_field("_last_ds", "notify_on_run_finished")
         try:
-            self.pg.write_device_options(notify_when_run_finished=bool(state))
+            self.pg.write_notify_when_run_finished(bool(state))
             self.statusBar().showMessage("Updated notify_when_run_finished", 1000)
         except Exception as e:
             self.statusBar().showMessage(f"Error: {e}", 3000)
 
     def on_notify_main_trig_out_changed(self, state: int):
+        self._resync_field("_last_ds", "notify_on_main_trig_out")
         try:
-            self.pg.write_device_options(notify_on_main_trig_out=bool(state))
+            self.pg.write_notify_on_main_trig_out(bool(state))
             self.statusBar().showMessage("Updated notify_on_main_trig_out", 1000)
         except Exception as e:
             self.statusBar().showMessage(f"Error: {e}", 3000)
@@ -1115,7 +1419,8 @@ class MainWindow(QMainWindow):
             return
         dev = self.deviceComboBox.itemData(idx)
         try:
-            ok = self.pg.connect(serial_number=dev.get("serial_number"))
+            # The device was validated by check_devices, so connect straight to its port
+            ok = self.pg.connect(device=dev)
             if ok:
                 self.statusBar().showMessage("Connected", 2000)
                 self.connStatusLabel.setText(f"Connected: {dev.get('comport')}")
@@ -1143,8 +1448,24 @@ class MainWindow(QMainWindow):
     def poll_status(self):
         if not self.pg.is_open():
             return
+        now = time.monotonic()
+        since_ds = now - self._last_ds_ts
+        if (now - self._last_unsolicited_ds_ts < self.request_timer.interval() * self.POLL_SKIP_FRACTION / 1000
+                and now - self._last_poll_ts < self.POLL_MS_IDLE / 1000):
+            # The device sent its state unprompted very recently, so this poll would only repeat it. Replies to
+            # our own polls don't count, or every other poll would be skipped whenever the reply takes longer
+            # than the rest of the interval.
+            return
+        if self._polls_in_flight >= self.MAX_POLLS_IN_FLIGHT:
+            if since_ds < self.POLL_STALL_S:
+                # The device (or link) is behind; let it catch up rather than queue more requests
+                return
+            # Replies have been lost rather than delayed, so start counting again
+            self._polls_in_flight = 0
         try:
-            self.pg.write_action(request_state=True, request_powerline_state=True, request_state_extras=True)
+            self.pg.write_poll()
+            self._polls_in_flight += 1
+            self._last_poll_ts = now
         except Exception as e:
             self.statusBar().showMessage(f"Error requesting state: {e}", 3000)
 
@@ -1158,12 +1479,23 @@ class MainWindow(QMainWindow):
         self.statusBar().showMessage("Disconnected", 3000)
         self.connStatusLabel.setText("Disconnected")
         self.portLabel.setText("—")
+        # A different device (or a power cycle) may be connected next, so the cached state no longer applies
+        self._last_state_int = None
+        self._last_ds = {}
+        self._last_pls = {}
+        self._last_run_time = None
+        self._pending_ui.clear()
+        self._polls_in_flight = 0
+        self._was_running = None
+        self.request_timer.setInterval(self.POLL_MS)
 
     def on_error(self, message: str):
         self.statusBar().showMessage(f"ERROR: {message}", 5000)
+        # A failed write may have been a static state, so don't assume the device has the state last sent
+        self._last_state_int = None
 
-    def on_bytes_dropped(self, msg_id: int, ts: float):
-        self.statusBar().showMessage(f"Dropped byte id {msg_id} at {ts:.3f}", 2000)
+    def on_bytes_dropped(self, msg_id: int, ts_ns: int):
+        self.statusBar().showMessage(f"Dropped byte id {msg_id} at {ts_ns / 1e9:.3f}", 2000)
 
     def on_echo(self, msg: dict):
         # decode_echo always provides these keys
@@ -1187,95 +1519,119 @@ class MainWindow(QMainWindow):
         # finished_notify, run_time. For now just log the dict.
         self.notifLog.append(str(msg))
 
+    def _queue_ui(self, slot, msg: dict):
+        if slot == self.on_devicestate:
+            # Stamped on arrival (time.monotonic_ns), not when the update is applied
+            self._last_ds_ts = msg["timestamp"] / 1e9
+            if self._polls_in_flight:
+                # Each poll asks for all three states, so the devicestate reply accounts for the poll
+                self._polls_in_flight -= 1
+            else:
+                # Sent by the device without being asked
+                self._last_unsolicited_ds_ts = self._last_ds_ts
+        self._pending_ui[slot] = msg
+        if not self._ui_timer.isActive():
+            self._ui_timer.start()
+
+    def _apply_pending_ui(self):
+        pending, self._pending_ui = self._pending_ui, {}
+        for slot, msg in pending.items():
+            slot(msg)
+
     def on_powerlinestate(self, msg: dict):
         # decode_powerlinestate returns:
         # 'trig_on_powerline', 'powerline_locked', 'powerline_period', 'powerline_trigger_delay'
+        # Only touch widgets whose value changed since the last powerlinestate
+        last = self._last_pls
         period_cycles = msg["powerline_period"]
         delay_cycles = msg["powerline_trigger_delay"]
         trig_on_powerline = msg["trig_on_powerline"]
 
         # Update powerline frequency label (period is in 10 ns clock cycles)
-        if period_cycles:
-            freq_hz = 1.0 / (period_cycles * 10e-9)
-            self.freqLabel.setText(f"{freq_hz:.3f}")
-        else:
-            self.freqLabel.setText("—")
+        if period_cycles != last.get("powerline_period"):
+            if period_cycles:
+                freq_hz = 1.0 / (period_cycles * 10e-9)
+                self.freqLabel.setText(f"{freq_hz:.3f}")
+            else:
+                self.freqLabel.setText("—")
 
         # Update "wait for powerline" checkbox from trig_on_powerline
-        old = self.waitCheckbox.blockSignals(True)
-        self.waitCheckbox.setChecked(bool(trig_on_powerline))
-        self.waitCheckbox.blockSignals(old)
+        if trig_on_powerline != last.get("trig_on_powerline"):
+            old = self.waitCheckbox.blockSignals(True)
+            self.waitCheckbox.setChecked(bool(trig_on_powerline))
+            self.waitCheckbox.blockSignals(old)
 
         # Update delay spinbox
-        delay_cycles = msg["powerline_trigger_delay"]
-        old = self.delaySpin.blockSignals(True)
-        self.delaySpin.set_value_from_ticks(delay_cycles)
-        self.delaySpin.blockSignals(old)
+        if delay_cycles != last.get("powerline_trigger_delay"):
+            old = self.delaySpin.blockSignals(True)
+            self.delaySpin.set_value_from_ticks(delay_cycles)
+            self.delaySpin.blockSignals(old)
+
+        self._last_pls = msg
 
     def on_devicestate_extras(self, msg: dict):
         # decode_devicestate_extras returns 'run_time'
         run_time = msg["run_time"]
-        self.runTimeLabel.setText(f"{run_time}")
+        if run_time != self._last_run_time:
+            self.runTimeLabel.setText(str(run_time))
+            self._last_run_time = run_time
 
     def on_devicestate(self, ds: dict):
-        # decode_devicestate returns a fixed set of keys; no need for existence checks
-        self._set_indicator(self.runningIndicator, bool(ds["running"]))
-        self._set_indicator(self.softwareRunEnable, bool(ds["software_run_enable"]))
-        self._set_indicator(self.hardwareRunEnable, bool(ds["hardware_run_enable"]))
-
-        self.currentAddrLabel.setText(str(ds["current_address"]))
-        self.finalAddrLabel.setText(str(ds["final_address"]))
-
-        # Accept hardware trigger combo
-        val = str(ds["accept_hardware_trigger"])
-        idx = self.acceptHwCombo.findText(val)
-        if idx >= 0:
-            old = self.acceptHwCombo.blockSignals(True)
-            self.acceptHwCombo.setCurrentIndex(idx)
-            self.acceptHwCombo.blockSignals(old)
-
-        # Reference clock source
-        self.refClockLabel.setText(f"{ds['clock_source']}")
-
-        # Notification checkboxes (note naming from decode_devicestate)
-        old = self.notifyFinishedCheckbox.blockSignals(True)
-        self.notifyFinishedCheckbox.setChecked(bool(ds["notify_on_run_finished"]))
-        self.notifyFinishedCheckbox.blockSignals(old)
-
-        old = self.notifyMainTrigOutCheckbox.blockSignals(True)
-        self.notifyMainTrigOutCheckbox.setChecked(bool(ds["notify_on_main_trig_out"]))
-        self.notifyMainTrigOutCheckbox.blockSignals(old)
+        # Walk the message once; fields without a handler (state, run_mode) are skipped.
+        # Most polls return identical values, so only touch widgets whose field changed.
+        last = self._last_ds
+        handlers = self._ds_handlers
+        changed = []
+        for key, value in ds.items():
+            handler = handlers.get(key)
+            if handler is not None and value != last.get(key):
+                changed.append((handler, value))
+        if changed:
+            # Block signals on all the affected widgets in one pass, so the programmatic sets don't echo back
+            # to the device, and always restore them even if a setter raises.
+            blocked = [(block, block(True)) for (block, _, _), _ in changed]
+            try:
+                for (_, setter, cast), value in changed:
+                    setter(cast(value))
+            finally:
+                for block, old in blocked:
+                    block(old)
 
-        # trigger_out_length
-        trig_len_cycles = ds["trigger_out_length"]
-        old = self.trigOutLenSpin.blockSignals(True)
-        self.trigOutLenSpin.set_value_from_ticks(trig_len_cycles)
-        self.trigOutLenSpin.blockSignals(old)
+        self._last_ds = ds
 
-        # trigger_out_delay
-        trig_delay_cycles = ds["trigger_out_delay"]
-        old = self.trigOutDelaySpin.blockSignals(True)
-        self.trigOutDelaySpin.set_value_from_ticks(trig_delay_cycles)
-        self.trigOutDelaySpin.blockSignals(old)
+        # Poll quickly while a run is in progress, and slowly while there is nothing changing to show
+        running = bool(ds["running"])
+        if running != self._was_running:
+            self.request_timer.setInterval(self.POLL_MS_RUNNING if running else self.POLL_MS_IDLE)
+            self._was_running = running
 
-        # Output state -> manual buttons
-        self._apply_state_to_buttons(self._state_to_bools(ds["state"]))
+        # Output state -> manual buttons. decode_devicestate always gives the state as a uint8 array of 24 bits;
+        # it rarely changes between polls, so the packing to an int is cached by the array's bytes.
+        self._apply_state_to_buttons(_state_bits_to_int(ds["state"].tobytes()), ds["timestamp"])
 
     def closeEvent(self, ev):
         try:
             self.request_timer.stop()
-            if self.pg and self.pg.is_open():
-                self.pg.disconnect()
+            self.flush_settings()
+            pg = self.pg
+            if pg is not None:
+                # A port that has already failed can raise here; it shouldn't stop the window closing
+                try:
+                    if pg.is_open():
+                        pg.disconnect()
+                except Exception:
+                    pass
         finally:
             super().closeEvent(ev)
 
 
 def main():
-    app = QApplication(sys.argv)
+    # Reuse an existing QApplication (e.g. when started from an interactive session) rather than creating a second
+    app = QApplication.instance() or QApplication(sys.argv)
     w = MainWindow()
     w.show()
-    sys.exit(app.exec_())
+    return app.exec_()
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,6 +1,11 @@
 import numpy as np
 import struct
 
+# Precompiled packers for the encoders. Every field is packed as a little endian 64 bit unsigned int and then
+# truncated to its width in the message, so only these two formats are ever needed.
+_U8 = struct.Struct('B')
+_U64 = struct.Struct('<Q')
+
 #########################################################
 # decodes
 def decode_internal_error(message):
@@ -13,7 +18,7 @@ def decode_internal_error(message):
 
     Parameters
     ----------
-    message : bytes
+    message : bytes-like
         The encoded bytes sent by the Pulse Gen, not including the message
         identifier.
 
@@ -41,8 +46,8 @@ def decode_internal_error(message):
     error information:  1 byte  [1]     8 bits      [8+:8]     unsigned int.
 
     '''
-    tags, =         struct.unpack('<Q', message[0:1] + bytes(7))
-    error_info, =   struct.unpack('<Q', message[1:2] + bytes(7))
+    tags =          int.from_bytes(message[0:1], 'little')
+    error_info =    int.from_bytes(message[1:2], 'little')
     invalid_identifier_received_tag =       (tags >> 0) & 0b1        
     timeout_waiting_for_msg_tag =           (tags >> 1) & 0b1     
     received_message_not_forwarded_tag =    (tags >> 2) & 0b1
@@ -65,7 +70,7 @@ def decode_easyprint(message):
 
     Parameters
     ----------
-    message : bytes
+    message : bytes-like
         The encoded bytes sent by the Pulse Gen, not including the message
         identifier.
 
@@ -95,7 +100,7 @@ def decode_devicestate(message):
 
     Parameters
     ----------
-    message : bytes
+    message : bytes-like
         The encoded bytes sent by the Pulse Gen, not including the message
         identifier.
 
@@ -139,11 +144,11 @@ def decode_devicestate(message):
     
     '''
     state =                 np.unpackbits(np.array([message[0], message[1], message[2]], dtype=np.uint8), bitorder='little')
-    final_address, =        struct.unpack('<Q', message[3:5] + bytes(6))
-    trigger_out_delay, =    struct.unpack('<Q', message[5:12] + bytes(1))
-    trigger_out_length, =   struct.unpack('<Q', message[12:13] + bytes(7))
-    current_address, =      struct.unpack('<Q', message[13:15] + bytes(6))
-    tags, =                 struct.unpack('<Q', message[15:17] + bytes(6))
+    final_address =         int.from_bytes(message[3:5], 'little')
+    trigger_out_delay =     int.from_bytes(message[5:12], 'little')
+    trigger_out_length =    int.from_bytes(message[12:13], 'little')
+    current_address =       int.from_bytes(message[13:15], 'little')
+    tags =                  int.from_bytes(message[15:17], 'little')
 
     run_mode_tag =                  (tags >> 0) & 0b1            
     accept_hardware_trigger_tag =   (tags >> 1) & 0b11              
@@ -171,7 +176,7 @@ def decode_powerlinestate(message):
 
     Parameters
     ----------
-    message : bytes
+    message : bytes-like
         The encoded bytes sent by the Pulse Gen, not including the message
         identifier.
 
@@ -202,9 +207,9 @@ def decode_powerlinestate(message):
     powerline_period:           3 bytes [1:4]   22 bits     [8+:22]   unsigned int.
     powerline_trigger_delay:    3 bytes [4:7]   22 bits     [32+:22]  unsigned int.
     '''
-    tags, =                     struct.unpack('<Q', message[0:1] + bytes(7))
-    powerline_period, =         struct.unpack('<Q', message[1:4] + bytes(5))
-    powerline_trigger_delay, =  struct.unpack('<Q', message[4:7] + bytes(5))
+    tags =                      int.from_bytes(message[0:1], 'little')
+    powerline_period =          int.from_bytes(message[1:4], 'little')
+    powerline_trigger_delay =   int.from_bytes(message[4:7], 'little')
     trig_on_powerline_tag = (tags >> 0) & 0b1
     powerline_locked_tag =  (tags >> 1) & 0b1
     trig_on_powerline = decode_lookup['trig_on_powerline'][trig_on_powerline_tag]
@@ -220,7 +225,7 @@ def decode_notification(message):
 
     Parameters
     ----------
-    message : bytes
+    message : bytes-like
         The encoded bytes sent by the Pulse Gen, not including the message
         identifier.
 
@@ -251,9 +256,9 @@ def decode_notification(message):
         trigger notify tag                      1 bit       [17] 
         end of run notify tag                   1 bit       [18] 
     '''
-    total_run_time, =           struct.unpack('<Q', message[0:7] + bytes(1))
-    address_of_notification, =  struct.unpack('<Q', message[7:9] + bytes(6))
-    tags, =                     struct.unpack('<Q', message[9:10] + bytes(7))
+    total_run_time =            int.from_bytes(message[0:7], 'little')
+    address_of_notification =   int.from_bytes(message[7:9], 'little')
+    tags =                      int.from_bytes(message[9:10], 'little')
     address_notify_tag =    (tags >> 0) & 0b1
     trig_notify_tag =       (tags >> 1) & 0b1
     finished_notify_tag =   (tags >> 2) & 0b1
@@ -269,7 +274,7 @@ def decode_echo(message):
 
     Parameters
     ----------
-    message : bytes
+    message : bytes-like
         The encoded bytes sent by the Pulse Gen, not including the message
         identifier.
 
@@ -297,11 +302,11 @@ def decode_echo(message):
     firmware version	2 bytes [3:5]   16 bits     [24+:16]  	16	65536       xx.xxx
     serial number		3 bytes [5:8]   24 bits     [40+:24]    24	16777216    xxxxxxxx
     '''
-    echoed_byte = message[0:1]
-    device_type, =      struct.unpack('<Q', message[1:2] + bytes(7))
-    hardware_version, = struct.unpack('<Q', message[2:3] + bytes(7))
-    firmware_version, = struct.unpack('<Q', message[3:5] + bytes(6))
-    serial_number, =    struct.unpack('<Q', message[5:8] + bytes(5))
+    echoed_byte = bytes(message[0:1])
+    device_type =       int.from_bytes(message[1:2], 'little')
+    hardware_version =  int.from_bytes(message[2:3], 'little')
+    firmware_version =  int.from_bytes(message[3:5], 'little')
+    serial_number =     int.from_bytes(message[5:8], 'little')
     firmware_version = str(firmware_version)
     firmware_version = firmware_version[:-3] + '.' + firmware_version[-3:]
     return {'echoed_byte':echoed_byte, 'device_type':device_type, 'hardware_version':hardware_version, 'firmware_version':firmware_version, 'serial_number':serial_number}
@@ -316,7 +321,7 @@ def decode_devicestate_extras(message):
 
     Parameters
     ----------
-    message : bytes
+    message : bytes-like
         The encoded bytes sent by the Pulse Gen, not including the message
         identifier.
 
@@ -343,9 +348,70 @@ def decode_devicestate_extras(message):
     total_run_time:             7 bytes [0:7]   56 bits     [0+:56]   unsigned int.
     reserved_for_future:        1 bytes [7:8]   8  bits     [56+:8]  unsigned int.
     '''
-    total_run_time, = struct.unpack('<Q', message[0:7] + bytes(1))
+    total_run_time =  int.from_bytes(message[0:7], 'little')
     return {'run_time':total_run_time}
 
+def decode_messages(data):
+    '''
+    Splits bytes received from the Pulse Gen into messages and decodes each 
+    one, stopping at the first message that is not yet complete. This is the
+    framing shared by every reader of the serial stream.
+
+    Parameters
+    ----------
+    data : bytes-like
+        Received bytes, starting at a message identifier. It must not be
+        resized until the iteration has finished.
+
+    Yields
+    ------
+    tuple
+        (end, message_identifier, message_type, message) for each complete
+        message, where end is the position in data just after it. message is
+        the decoded dictionary, or the exception raised by the decode 
+        function if decoding failed. A byte that is not a valid message 
+        identifier is yielded on its own, with message_type and message None.
+        Everything from the last end onwards (all of data if nothing is 
+        yielded) is the start of a message that has not been completely
+        received.
+
+    See Also
+    --------
+    msgin_decodeinfo : The length, type and decode function of each message.
+
+    Notes
+    -----
+    Each message is passed to its decode function as a memoryview of data, so
+    it is not copied. The views are released before the next message is 
+    yielded and when the iteration ends.
+    '''
+    table = msgin_decodetable
+    view = memoryview(data)
+    try:
+        pos = 0
+        end = len(view)
+        while pos < end:
+            message_identifier = view[pos]
+            entry = table[message_identifier]
+            if entry is None:
+                pos += 1
+                yield pos, message_identifier, None, None
+                continue
+            message_length, message_type, decode_function = entry
+            if end - pos < message_length:
+                # Wait for the rest of the message
+                break
+            payload = view[pos + 1:pos + message_length]
+            pos += message_length
+            try:
+                message = decode_function(payload)
+            except Exception as ex:
+                message = ex
+            payload.release()
+            yield pos, message_identifier, message_type, message
+    finally:
+        view.release()
+
 
 #########################################################
 # encode
@@ -398,7 +464,7 @@ def encode_echo(byte_to_echo):
     if len(byte_to_echo) != 1:
         err_msg = f'\'byte_to_echo\' must have length 1'
         raise ValueError(err_msg)
-    message_identifier = struct.pack('B', msgout_identifier['echo'])
+    message_identifier = _U8.pack(msgout_identifier['echo'])
     return message_identifier + byte_to_echo
 
 def encode_powerline_trigger_options(trigger_on_powerline=None, powerline_trigger_delay=None):
@@ -466,9 +532,9 @@ def encode_powerline_trigger_options(trigger_on_powerline=None, powerline_trigge
     # Tag arguments are not explicitly validated. Errors are caught in the dictionary lookup
     trigger_on_powerline_tag =  encode_lookup['trigger_on_powerline'][trigger_on_powerline] << 1
     tags = update_powerline_trigger_delay_tag | trigger_on_powerline_tag
-    message_identifier =        struct.pack('B', msgout_identifier['powerline_trigger_options'])
-    powerline_trigger_delay =   struct.pack('<Q', powerline_trigger_delay)[:3]
-    tags =                      struct.pack('<Q', tags)[:1]
+    message_identifier =        _U8.pack(msgout_identifier['powerline_trigger_options'])
+    powerline_trigger_delay =   _U64.pack(powerline_trigger_delay)[:3]
+    tags =                      _U64.pack(tags)[:1]
     return message_identifier + powerline_trigger_delay + tags
 
 def encode_device_options(final_address=None, run_mode=None, accept_hardware_trigger=None, trigger_out_length=None, trigger_out_delay=None, notify_on_main_trig_out=None, notify_when_run_finished=None, software_run_enable=None):
@@ -629,11 +695,11 @@ def encode_device_options(final_address=None, run_mode=None, accept_hardware_tri
     software_run_enable_tag =       encode_lookup['software_run_enable'][software_run_enable] << 10
     notify_when_run_finished_tag =  encode_lookup['notify_when_finished'][notify_when_run_finished] << 12
     tags = run_mode_tag | trigger_source_tag | notify_on_main_trig_out_tag | update_final_address_tag | update_trigger_out_delay_tag | update_trigger_out_length_tag | software_run_enable_tag | notify_when_run_finished_tag
-    message_identifier =    struct.pack('B', msgout_identifier['device_options'])
-    final_address =         struct.pack('<Q', final_address)[:2]
-    trigger_out_delay =     struct.pack('<Q', trigger_out_delay)[:7]
-    trigger_out_length =    struct.pack('<Q', trigger_out_length)[:1]
-    tags =                  struct.pack('<Q', tags)[:2]
+    message_identifier =    _U8.pack(msgout_identifier['device_options'])
+    final_address =         _U64.pack(final_address)[:2]
+    trigger_out_delay =     _U64.pack(trigger_out_delay)[:7]
+    trigger_out_length =    _U64.pack(trigger_out_length)[:1]
+    tags =                  _U64.pack(tags)[:2]
     return message_identifier + final_address + trigger_out_delay + trigger_out_length + tags
 
 def encode_action(trigger_now=False, disable_after_current_run=False, reset_run=False, request_state=False, request_powerline_state=False, request_state_extras=False):
@@ -739,8 +805,8 @@ def encode_action(trigger_now=False, disable_after_current_run=False, reset_run=
     reset_run_tag =                     encode_lookup['reset_run'][reset_run] << 4
     request_state_extras_tag =          encode_lookup['request_state_extras'][request_state_extras] << 5
     tags = trigger_now_tag | request_state_tag | reset_run_tag | disable_after_current_run | request_powerline_state_tag | request_state_extras_tag
-    message_identifier =    struct.pack('B', msgout_identifier['action_request'])
-    tags =                  struct.pack('<Q', tags)[:1]
+    message_identifier =    _U8.pack(msgout_identifier['action_request'])
+    tags =                  _U64.pack(tags)[:1]
     return message_identifier + tags
 
 def encode_general_debug(message):
@@ -769,8 +835,8 @@ def encode_general_debug(message):
     Message format:                             BITS USED   FPGA INDEX.
     general_putpose_input:      8 bytes [0:8]   64 bits     [0+:64]     unsigned int.
     '''
-    message_identifier =    struct.pack('B', msgout_identifier['general_input'])
-    message =               struct.pack('<Q', message)[:8]
+    message_identifier =    _U8.pack(msgout_identifier['general_input'])
+    message =               _U64.pack(message)[:8]
     return message_identifier + message
 
 def encode_static_state(state):
@@ -821,10 +887,48 @@ def encode_static_state(state):
     main_outputs_state:         3 bytes [0:3]   24 bits     [0+:24]     unsigned int.
     '''
     state = state_multiformat_to_int(state)
-    message_identifier =    struct.pack('B', msgout_identifier['set_static_state'])
-    state =                 struct.pack('<Q', state)[:3] 
+    message_identifier =    _U8.pack(msgout_identifier['set_static_state'])
+    state =                 _U64.pack(state)[:3] 
     return message_identifier + state
 
+def encode_static_state_bits(state):
+    '''
+    Generates the same command as `encode_static_state`, for a state that is
+    already in integer format. This skips the format conversion of
+    `encode_static_state`, for callers (such as the GUI) that keep the state as
+    an int.
+
+    Parameters
+    ----------
+    state : int
+        The output state of all 24 channels, where the least significant bit
+        corresponds to channel 0.
+
+    Returns
+    -------
+    bytes
+        The raw bytes of the command, ready to be uploaded to the Pulse Gen.
+
+    Raises
+    ------
+    TypeError
+        `state` is not an int.
+    ValueError
+        `state` is not in range [0, 2**24-1].
+
+    See Also
+    --------
+    encode_static_state : The general version, which also accepts a list,
+        tuple, or array of channel states.
+    '''
+    if not isinstance(state, (int, np.integer)):
+        err_msg = f'\'state\' must be an int. You tried to set it to type {type(state)}'
+        raise TypeError(err_msg)
+    if state < 0 or state > 16777215:
+        err_msg = f'\'state\' out of range. It must be in range [{bin(0)}, {bin(16777215)}]'
+        raise ValueError(err_msg)
+    return _U8.pack(msgout_identifier['set_static_state']) + int(state).to_bytes(3, 'little')
+
 def encode_instruction(address, duration, state, goto_address=0, goto_counter=0, stop_and_wait=False, hardware_trig_out=False, notify_computer=False, powerline_sync=False):
     """
     Generates a timing instruction encoded in a format that is readable by the 
@@ -975,15 +1079,102 @@ def encode_instruction(address, duration, state, goto_address=0, goto_counter=0,
     notify_computer_tag =   encode_lookup['notify_on_instruction'][notify_computer] << 2
     powerline_sync_tag =    encode_lookup['powerline_sync'][powerline_sync] << 3
     tags = stop_and_wait_tag | hard_trig_out_tag | notify_computer_tag | powerline_sync_tag
-    message_identifier =    struct.pack('B', msgout_identifier['load_ram'])
-    address =               struct.pack('<Q', address)[:2]
-    state =                 struct.pack('<Q', state)[:3]
-    duration =              struct.pack('<Q', duration)[:6]
-    goto_address =          struct.pack('<Q', goto_address)[:2]
-    goto_counter =          struct.pack('<Q', goto_counter)[:4]
-    tags =                  struct.pack('<Q', tags)[:1]
+    message_identifier =    _U8.pack(msgout_identifier['load_ram'])
+    address =               _U64.pack(address)[:2]
+    state =                 _U64.pack(state)[:3]
+    duration =              _U64.pack(duration)[:6]
+    goto_address =          _U64.pack(goto_address)[:2]
+    goto_counter =          _U64.pack(goto_counter)[:4]
+    tags =                  _U64.pack(tags)[:1]
     return message_identifier + address + state + duration + goto_address + goto_counter + tags
 
+def encode_instruction_tags(stop_and_wait=False, hardware_trig_out=False, notify_computer=False, powerline_sync=False):
+    """
+    Packs the flags of a timing instruction into the 4 bit tags field used by
+    `encode_instruction`. See `encode_instruction` for the meaning of each flag.
+
+    Returns
+    -------
+    int
+        The tags field, with stop_and_wait in bit 0, hardware_trig_out in bit 1,
+        notify_computer in bit 2 and powerline_sync in bit 3.
+
+    See Also
+    --------
+    encode_instruction_batch : function which accepts the packed tags.
+    """
+    # Tag arguments are not explicitly validated. Errors are caught in the dictionary lookup
+    stop_and_wait_tag =     encode_lookup['stop_and_wait'][stop_and_wait] << 0
+    hard_trig_out_tag =     encode_lookup['trig_out_on_instruction'][hardware_trig_out] << 1
+    notify_computer_tag =   encode_lookup['notify_on_instruction'][notify_computer] << 2
+    powerline_sync_tag =    encode_lookup['powerline_sync'][powerline_sync] << 3
+    return stop_and_wait_tag | hard_trig_out_tag | notify_computer_tag | powerline_sync_tag
+
+def encode_instruction_batch(address, duration, state, goto_address, goto_counter, tags):
+    """
+    Generates many timing instructions at once. This is equivalent to calling
+    `encode_instruction` for every element of the arguments, but all of the 
+    range checking and bit packing is done on whole arrays with numpy, so it is 
+    much faster for long sequences.
+
+    Parameters
+    ----------
+    address, duration, goto_address, goto_counter : array_like of int
+        Same meaning and valid range as the `encode_instruction` arguments of
+        the same name, with one element per instruction.
+    state : array_like of int
+        The output state of each instruction in integer format, where bit i is
+        the state of channel i. See `state_multiformat_to_int`.
+    tags : array_like of int
+        The flags of each instruction, packed with `encode_instruction_tags`.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of dtype uint8 and shape (number of instructions, 19). Each row 
+        holds the raw bytes of one instruction, identical to what
+        `encode_instruction` returns.
+
+    Raises
+    ------
+    TypeError
+        Arguments are checked for type to avoid undetermined behaviour of the
+        Pulse Gen.
+    ValueError
+        Arguments are checked to ensure they lie in a valid range to avoid
+        undetermined behaviour of Pulse Gen.
+
+    See Also
+    --------
+    encode_instruction : The function that encodes a single timing instruction,
+        which also documents the bitwise layout.
+    """
+    fields = {'address':address, 'duration':duration, 'state':state, 'goto_address':goto_address, 'goto_counter':goto_counter, 'tags':tags}
+    valid_ranges = {'address':(0, 8191), 'duration':(1, 281474976710655), 'state':(0, 16777215), 'goto_address':(0, 8191), 'goto_counter':(0, 4294967295), 'tags':(0, 15)}
+    for name, values in fields.items():
+        values = np.asarray(values)
+        if values.size and not np.issubdtype(values.dtype, np.integer):
+            err_msg = f'\'{name}\' must contain int or np.integer values, not {values.dtype}'
+            raise TypeError(err_msg)
+        low, high = valid_ranges[name]
+        if values.size and (values.min() < low or values.max() > high):
+            err_msg = f'\'{name}\' out of range. Must be in range [{low}, {high}]'
+            raise ValueError(err_msg)
+        fields[name] = values.astype(np.int64, copy=False)
+    # Other consistancy checking
+    if np.any((fields['address'] == 0) & ((fields['tags'] >> 3) & 1).astype(bool)):
+        err_msg = f'Instruction at address=0 cannot have powerline_sync=True. The run would start automatically. See examples.py for workaround.'
+        raise ValueError(err_msg)
+    encoded = np.empty((len(fields['address']), 19), dtype=np.uint8)
+    encoded[:, 0] = msgout_identifier['load_ram']
+    # (field, first byte, number of bytes), little endian
+    layout = (('address', 1, 2), ('state', 3, 3), ('duration', 6, 6), ('goto_address', 12, 2), ('goto_counter', 14, 4), ('tags', 18, 1))
+    for name, first_byte, num_bytes in layout:
+        # View each value as its 8 little endian bytes and copy the low ones straight into place, rather than shifting out one byte at a time
+        field_bytes = fields[name].astype('<u8').view(np.uint8).reshape(-1, 8)
+        encoded[:, first_byte:first_byte + num_bytes] = field_bytes[:, :num_bytes]
+    return encoded
+
 def state_multiformat_to_int(state):
     """
     Takes the argument `state` representing the output state of all channels and
@@ -1051,6 +1242,13 @@ msgin_decodeinfo = {
     106:{'message_length':9,    'decode_function':decode_devicestate_extras,'message_type':'devicestate_extras'}
     }
 
+# msgin_decodeinfo as a list indexed by message identifier, holding (message_length, message_type, decode_function)
+# or None for an invalid identifier, so the read loops index a list rather than look up a dict per message
+msgin_decodetable = [None]*256
+for _message_identifier, _decodeinfo in msgin_decodeinfo.items():
+    msgin_decodetable[_message_identifier] = (_decodeinfo['message_length'], _decodeinfo['message_type'], _decodeinfo['decode_function'])
+del _message_identifier, _decodeinfo
+
 # This is a "reverse lookup" dictionaty for the msgin_decodeinfo. I don't think I use this much/at all. It can probably be deleted.
 msgin_identifier = {value['message_type']:key for key, value in msgin_decodeinfo.items()}
 